@@ -0,0 +1,85 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Optional, Set
+
+
+class MicroBatcher:
+    """Dispatches queued calls together without delaying any of them, optionally bounding how many run at once"""
+
+    def __init__(
+        self,
+        fn: Callable[..., Awaitable[Any]],
+        max_batch: int = 16,
+        max_in_flight: Optional[int] = None,
+    ):
+        self._fn = fn
+        self._max_batch = max_batch
+        self._max_in_flight = max_in_flight
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        # The event loop only keeps weak references to tasks, so running flushes are held here
+        self._flush_tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, *args: Any, **kwargs: Any) -> Any:
+        """Queue one call of fn and wait for its result"""
+        loop = asyncio.get_running_loop()
+        # The queue and drain task belong to the loop that created them
+        if self._loop is not loop or self._queue is None:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            if self._max_in_flight is not None:
+                self._semaphore = asyncio.Semaphore(self._max_in_flight)
+            self._drain_task = loop.create_task(self._drain(self._queue))
+
+        future = loop.create_future()
+        self._queue.put_nowait((args, kwargs, future))
+        return await future
+
+    async def aclose(self) -> None:
+        """Stop collecting calls and wait for the dispatched ones to finish"""
+        if self._drain_task is not None:
+            self._drain_task.cancel()
+            await asyncio.gather(self._drain_task, return_exceptions=True)
+            self._drain_task = None
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        # Calls still queued are never dispatched
+        while self._queue is not None and not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+        self._loop = None
+        self._queue = None
+
+    async def _drain(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            # Only calls that are already waiting join the batch; a lone call is never held back
+            while len(batch) < self._max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            # Flush in the background so the next calls are picked up immediately
+            task = loop.create_task(self._flush(batch))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    async def _run(self, args: tuple, kwargs: dict) -> Any:
+        if self._semaphore is None:
+            return await self._fn(*args, **kwargs)
+        # Bound concurrent calls, e.g. to stay within the API rate limits
+        async with self._semaphore:
+            return await self._fn(*args, **kwargs)
+
+    async def _flush(self, batch: list) -> None:
+        results = await asyncio.gather(
+            *(self._run(args, kwargs) for args, kwargs, _ in batch),
+            return_exceptions=True,
+        )
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,51 @@
+import os
+import logging
+import threading
+from typing import List
+
+from colorama import Fore, init
+
+
+class ColorFormatter(logging.Formatter):
+    """Colors each record with the colorama code passed as extra={"color": ...}"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return getattr(record, "color", "") + super().format(record) + Fore.RESET
+
+
+def _log_level() -> str:
+    return os.getenv("LOG_LEVEL", "INFO").upper()
+
+
+_loggers: List[logging.Logger] = []
+_env_loaded = False
+_env_lock = threading.Lock()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a router's progress messages, at the LOG_LEVEL level (default INFO)"""
+    log = logging.getLogger(name)
+    if not log.handlers:
+        # Initialize colorama for cross-platform colored terminal output
+        init()
+        handler = logging.StreamHandler()
+        handler.setFormatter(ColorFormatter("%(message)s"))
+        log.addHandler(handler)
+        log.setLevel(_log_level())
+        log.propagate = False
+        _loggers.append(log)
+    return log
+
+
+def load_env() -> None:
+    """Load .env once per process; dotenv is only imported on the first call"""
+    global _env_loaded
+    with _env_lock:
+        if _env_loaded:
+            return
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+        # .env may set LOG_LEVEL too
+        for log in _loggers:
+            log.setLevel(_log_level())
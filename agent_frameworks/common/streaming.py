@@ -0,0 +1,24 @@
+import asyncio
+from typing import Any, AsyncIterator
+
+_DONE = object()
+
+
+class UpdateRelay:
+    """Hands values produced on another thread or event loop to the caller's loop, in order"""
+
+    def __init__(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def put(self, value: Any) -> None:
+        """Thread-safe; may be called from any thread or loop"""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, value)
+
+    async def drain(self, future: "asyncio.Future[Any]") -> AsyncIterator[Any]:
+        """Yield the values put so far and as they arrive, until the producing future is done"""
+        # The producer's puts are queued with call_soon_threadsafe before its future resolves,
+        # so the done marker from this callback is always read last
+        future.add_done_callback(lambda _: self._queue.put_nowait(_DONE))
+        while (value := await self._queue.get()) is not _DONE:
+            yield value
@@ -1,15 +1,17 @@
 import os
 import sys
 
-sys.path.insert(1, os.path.join(sys.path[0], ".."))
+_FRAMEWORKS_DIR = os.path.join(sys.path[0], "..")
+if _FRAMEWORKS_DIR not in sys.path:
+    sys.path.insert(1, _FRAMEWORKS_DIR)
 
-from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
+from common.logs import load_env
 from prompt_templates.data_analysis_template import PROMPT_TEMPLATE, SYSTEM_PROMPT
 
-load_dotenv()
+load_env()
 
 
 @tool
@@ -5,7 +5,9 @@ from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
 
-sys.path.insert(1, os.path.join(sys.path[0], ".."))
+_FRAMEWORKS_DIR = os.path.join(sys.path[0], "..")
+if _FRAMEWORKS_DIR not in sys.path:
+    sys.path.insert(1, _FRAMEWORKS_DIR)
 
 from db.database import get_schema, get_table, run_query
 from prompt_templates.sql_generator_template import SYSTEM_PROMPT
@@ -1,44 +1,50 @@
 import os
 import sys
-import uuid
+import asyncio
 import argparse
-from colorama import Fore, init
 
-sys.path.insert(1, os.path.join(sys.path[0], ".."))
-import gradio as gr
-from langgraph.router import run_agent
-from langgraph.router_web import RealEstateRouter
+_FRAMEWORKS_DIR = os.path.join(sys.path[0], "..")
+if _FRAMEWORKS_DIR not in sys.path:
+    sys.path.insert(1, _FRAMEWORKS_DIR)
 
-# Create a global instance of the router
-real_estate_router = RealEstateRouter()
+# Global instance of the real estate router, created by launch_app in real_estate mode
+real_estate_router = None
+# The default mode's agent runner, imported by launch_app so no request pays for the import
+run_agent = None
 
-def gradio_interface(message, history, mode="default"):
+async def gradio_interface(message, history, request, mode="default"):
     """Enhanced Gradio interface with conversation persistence and mode switching"""
-    # Generate a session ID based on the conversation history length
-    # This is a simple way to maintain conversation continuity within a session
-    session_id = str(uuid.uuid4()) if not history else f"session_{len(history)}"
+    # Gradio's session hash is stable for the lifetime of a browser session,
+    # so every turn of a conversation maps to the same thread
+    session_id = request.session_hash
     
     # Run the appropriate agent based on mode
     if mode == "real_estate":
-        return real_estate_router.process_query(message, thread_id=session_id)
+        async for partial_response in real_estate_router.astream_query(message, thread_id=session_id):
+            yield partial_response
     else:
-        # Default to SQL/data analysis mode
-        return run_agent(message, thread_id=session_id)
+        # Default to SQL/data analysis mode, streamed as the tokens arrive
+        async for partial_response in run_agent(message, thread_id=session_id):
+            yield partial_response
 
-def launch_app():
-    """Launch the Gradio app with mode selection"""
-    # Parse command line arguments
-    parser = argparse.ArgumentParser(description="LangGraph Agent")
-    parser.add_argument("--mode", type=str, choices=["default", "real_estate"], 
-                      default="default", help="Agent mode: default (SQL/data) or real_estate")
-    args = parser.parse_args()
+def launch_app(mode="default"):
+    """Launch the Gradio app in the given mode"""
+    # Heavy dependencies are only imported once the arguments are valid
+    global real_estate_router, run_agent
+    import gradio as gr
+    from colorama import Fore, init
+    if mode == "real_estate":
+        from langgraph.router_web import RealEstateRouter
+        real_estate_router = RealEstateRouter()
+    else:
+        from langgraph.router import run_agent
     
     # Initialize colorama
     init()
-    print(Fore.CYAN, f"\n\n[LangGraph] Initializing Gradio interface in {args.mode} mode\n")
+    print(Fore.CYAN, f"\n\n[LangGraph] Initializing Gradio interface in {mode} mode\n")
     
     # Configure interface based on selected mode
-    if args.mode == "real_estate":
+    if mode == "real_estate":
         title = "LangGraph Real Estate Agent"
         description = "A real estate assistant that helps with property searches, mortgages, and neighborhood information."
         examples = [
@@ -56,21 +62,37 @@ def launch_app():
             "Calculate 245 * 37"
         ]
     
+    # The mode is bound once here; Gradio streams the handler since it is an async generator.
+    # A closure is used rather than functools.partial so Gradio still detects the gr.Request parameter.
+    async def chat_fn(message, history, request: gr.Request):
+        async for partial_response in gradio_interface(message, history, request, mode):
+            yield partial_response
+
     # Create a more informative interface
     interface = gr.ChatInterface(
-        fn=lambda message, history: gradio_interface(message, history, args.mode),
+        fn=chat_fn,
         title=title,
         description=description,
         examples=examples,
-        theme="soft"
+        theme="soft",
+        # Gradio defaults to one submission at a time; the async handler can serve many sessions at once
+        concurrency_limit=32,
     )
     
     # Launch with sharing disabled for security
-    print(Fore.GREEN, f"\n\n[LangGraph] Launching Gradio interface in {args.mode} mode\n")
-    interface.launch(share=False)
+    print(Fore.GREEN, f"\n\n[LangGraph] Launching Gradio interface in {mode} mode\n")
+    try:
+        interface.launch(share=False)
+    finally:
+        # The default mode opens its checkpoint database on the first query; close it on shutdown
+        router_module = sys.modules.get("langgraph.router")
+        if router_module is not None:
+            asyncio.run(router_module.close_checkpointer())
 
 if __name__ == "__main__":
-    # Create threads directory for persistence if it doesn't exist
-    os.makedirs("./threads", exist_ok=True)
-    os.makedirs("./threads/real_estate", exist_ok=True)
-    launch_app()
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="LangGraph Agent")
+    parser.add_argument("--mode", type=str, choices=["default", "real_estate"], 
+                      default="default", help="Agent mode: default (SQL/data) or real_estate")
+    args = parser.parse_args()
+    launch_app(args.mode)
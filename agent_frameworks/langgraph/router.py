@@ -1,116 +1,239 @@
 import os
 import sys
-from typing import Dict, List, TypedDict, Union, Any, Annotated, Optional
-from pydantic import BaseModel
+import re
+import asyncio
+import operator
+from functools import cache
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Union, Any, Annotated, Optional
+from pydantic import BaseModel, ConfigDict, Field
 
-sys.path.insert(1, os.path.join(sys.path[0], ".."))
+# Make the shared agent_frameworks modules importable, once per process
+_FRAMEWORKS_DIR = os.path.join(sys.path[0], "..")
+if _FRAMEWORKS_DIR not in sys.path:
+    sys.path.insert(1, _FRAMEWORKS_DIR)
 
-from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+import aiosqlite
+import httpx
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage, trim_messages
+from langchain_core.runnables import RunnableConfig
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_openai import ChatOpenAI
 from langgraph.analyze_data import data_analyzer
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.generate_sql_query import generate_and_run_sql_query
 from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
+from common.logs import load_env
 from prompt_templates.router_template import SYSTEM_PROMPT
 
-load_dotenv()
+# .env is loaded once per process, however many modules ask for it
+load_env()
 
-# Define modern state management using TypedDict and Pydantic
-class AgentState(TypedDict):
-    messages: List[Union[HumanMessage, AIMessage, SystemMessage]]
-    next: Optional[str]
+# All threads share one SQLite checkpoint file (WAL mode is enabled by the saver setup).
+# The directory is created once at import, never on the request path.
+_THREADS_ROOT = Path("./threads")
+_THREADS_ROOT.mkdir(parents=True, exist_ok=True)
+_CHECKPOINT_DB = _THREADS_ROOT / "agent_state.db"
+
+# The saver binds to the running event loop, so it is opened on first use rather than at import
+_checkpointer: Optional[AsyncSqliteSaver] = None
+_checkpointer_lock = asyncio.Lock()
+
+
+async def _get_checkpointer() -> AsyncSqliteSaver:
+    """The checkpointer shared by every thread, opened inside the running event loop"""
+    global _checkpointer
+    async with _checkpointer_lock:
+        if _checkpointer is None:
+            _checkpointer = AsyncSqliteSaver(await aiosqlite.connect(_CHECKPOINT_DB))
+    return _checkpointer
+
+
+async def close_checkpointer() -> None:
+    """Close the checkpoint database; its connection thread would otherwise keep the process alive"""
+    global _checkpointer
+    if _checkpointer is not None:
+        await _checkpointer.conn.close()
+        _checkpointer = None
+
+# Define modern state management using a Pydantic state schema
+class AgentState(BaseModel):
+    # Nodes return only new messages; add_messages appends them to the channel
+    messages: Annotated[List[BaseMessage], add_messages] = Field(default_factory=list)
+    next: Optional[str] = None
+
+    model_config = ConfigDict(extra="forbid")
 
 
 # Set up tools 
 tools = [generate_and_run_sql_query, data_analyzer]
 
+# OpenAI tool schemas, inferred from the tools once at import
+_TOOL_SCHEMAS = [convert_to_openai_tool(t) for t in tools]
+
+# Pooled HTTP/2 clients shared by every request; the default pool caps out at 10 connections
+_HTTP_LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=100)
+_http_client = httpx.Client(limits=_HTTP_LIMITS, http2=True, timeout=60.0)
+_http_async_client = httpx.AsyncClient(limits=_HTTP_LIMITS, http2=True, timeout=60.0)
+
 # Using latest model with function calling
-model = ChatOpenAI(model="gpt-4o", temperature=0).bind_tools(tools)
+model = ChatOpenAI(
+    model="gpt-4o",
+    temperature=0,
+    http_client=_http_client,
+    http_async_client=_http_async_client,
+).bind(tools=_TOOL_SCHEMAS)
+
+
+# The model only sees the system prompt plus the most recent messages of a thread
+_MAX_HISTORY_MESSAGES = 12
+
+
+# Pure two-operand arithmetic such as "Calculate 245 * 37" is answered without the LLM
+_ARITHMETIC_RE = re.compile(
+    r"^\s*(?:calculate|compute|what is|what's)?\s*"
+    r"(-?\d+(?:\.\d+)?)\s*([-+*/x])\s*(-?\d+(?:\.\d+)?)\s*[=?]?\s*$",
+    re.IGNORECASE,
+)
+_ARITHMETIC_OPS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "x": operator.mul,
+    "X": operator.mul,
+    "/": operator.truediv,
+}
+
+
+def _try_arithmetic(query: str) -> Optional[str]:
+    """Return the answer to a pure arithmetic query, or None if it needs the model"""
+    match = _ARITHMETIC_RE.match(query)
+    if not match:
+        return None
+    left, op, right = match.groups()
+    if op == "/" and float(right) == 0:
+        return None
+    if "." in left or "." in right or op == "/":
+        result = _ARITHMETIC_OPS[op](float(left), float(right))
+    else:
+        result = _ARITHMETIC_OPS[op](int(left), int(right))
+    if isinstance(result, float):
+        result = int(result) if result.is_integer() else round(result, 10)
+    return f"{left} {op} {right} = {result}"
 
 
 # Define the agent node with enhanced error handling
-def agent(state: AgentState) -> Dict[str, Any]:
+async def agent(state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
     """Agent node that processes messages and determines next actions"""
-    messages = state["messages"]
+    messages = state.messages
+    
+    # Answer simple arithmetic directly instead of paying for a model round-trip
+    last_message = messages[-1]
+    if isinstance(last_message, HumanMessage) and isinstance(last_message.content, str):
+        answer = _try_arithmetic(last_message.content)
+        if answer is not None:
+            return {"messages": [AIMessage(content=answer)], "next": None}
+    
+    # Bound the history sent to the model; never start the window on an orphaned tool result
+    window = trim_messages(
+        messages,
+        max_tokens=_MAX_HISTORY_MESSAGES + 1,
+        token_counter=len,
+        strategy="last",
+        include_system=True,
+        start_on=("human", "ai"),
+    )
     
     try:
-        # Call the model with the current messages
-        response = model.invoke(messages)
-        return {"messages": messages + [response], "next": None}
+        # Call the model with the recent messages; concurrent runs overlap on the event loop
+        response = await model.ainvoke(window, config=config)
+        return {"messages": [response], "next": None}
     except Exception as e:
         # Error handling to make the agent more robust
         error_message = AIMessage(content=f"Error occurred: {str(e)}. Let me try a different approach.")
-        return {"messages": messages + [error_message], "next": None}
+        return {"messages": [error_message], "next": None}
 
 
 # Define conditional routing based on tool calls or completion
-def router(state: AgentState) -> str:
+def router(state: AgentState, _END: str = END) -> str:
     """Route to the appropriate next node based on the latest message"""
-    messages = state["messages"]
-    last_message = messages[-1]
-    
     # If there's an explicit next destination in state, use that
-    if state.get("next"):
-        return state["next"]
-    
-    # Check for tool calls in the last message
-    if hasattr(last_message, "tool_calls") and last_message.tool_calls:
-        return "tools"
+    nxt = state.next
+    if nxt is not None:
+        return nxt
     
-    # End the conversation if no tool calls detected
-    return END
+    # Go to the tools on tool calls, otherwise end the conversation
+    last_message = state.messages[-1]
+    return "tools" if getattr(last_message, "tool_calls", None) else _END
 
 
-def create_agent_graph(persist_dir: str = None) -> StateGraph:
+async def create_agent_graph() -> StateGraph:
     """Create a more advanced agent graph with persistence support"""
+    return _compile_agent_graph(await _get_checkpointer())
+
+
+@cache
+def _compile_agent_graph(checkpointer: Optional[AsyncSqliteSaver]) -> StateGraph:
+    # The topology is fixed and every thread shares one checkpointer, so this compiles once
+    # (plus once without a checkpointer for stateless calls)
     # Initialize the graph with the enhanced state
     workflow = StateGraph(AgentState)
     
     # Add nodes for the main agent and tool execution
+    # Under ainvoke, ToolNode runs all tool calls of one message concurrently (asyncio.gather)
     workflow.add_node("agent", agent)
     workflow.add_node("tools", ToolNode(tools))
     
     # Define the workflow with conditional edges
-    workflow.add_edge("agent", router)
+    workflow.add_conditional_edges("agent", router, ["tools", END])
     workflow.add_edge("tools", "agent")
     
     # Start with the agent node
     workflow.set_entry_point("agent")
     
-    # Compile without explicit persistence
-    # In LangGraph 0.2.x, we'll handle persistence separately
-    return workflow.compile()
+    # Persist state in the checkpointer if given, keyed by the thread_id in the run config
+    return workflow.compile(checkpointer=checkpointer)
 
 
-def run_agent(query: str, thread_id: str = None) -> str:
-    """Run the agent with a specific query and optional thread_id for persistence"""
-    # Set up persistence directory if thread_id is provided
-    persist_dir = f"./threads/{thread_id}" if thread_id else None
-    
-    # Create the agent graph with optional persistence
-    app = create_agent_graph(persist_dir)
+# The system prompt never changes, so its message and the base state are built once.
+# A fixed id lets add_messages replace it in place on later turns instead of appending a copy.
+_SYSTEM_MSG = SystemMessage(content=SYSTEM_PROMPT, id="system-prompt")
+_BASE_STATE_TEMPLATE = {"messages": None, "next": None}
+
+
+async def run_agent(query: str, thread_id: Optional[str] = None) -> AsyncIterator[str]:
+    """Run the agent with a specific query and stream the growing response text"""
+    # One compiled graph serves every thread; calls without a thread_id keep no state,
+    # so they run without a checkpointer and never write to the database
+    if thread_id is None:
+        app, config = _compile_agent_graph(None), {}
+    else:
+        app = await create_agent_graph()
+        # Threads are partitioned inside the shared checkpointer
+        config = {"configurable": {"thread_id": thread_id}}
     
     # Set up initial state with the query and system prompt
-    initial_state = {
-        "messages": [
-            SystemMessage(content=SYSTEM_PROMPT),
-            HumanMessage(content=query)
-        ],
-        "next": None
-    }
-    
-    # Configure with thread_id if provided for continuity
-    config = {"configurable": {"thread_id": thread_id}} if thread_id else {}
+    initial_state = _BASE_STATE_TEMPLATE.copy()
+    initial_state["messages"] = [_SYSTEM_MSG, HumanMessage(content=query)]
     
-    # Execute the workflow and extract the final response
+    # Stream tokens from the agent node; tool output and the tools' own LLM calls are skipped
     try:
-        final_state = app.invoke(initial_state, config=config)
-        response_messages = [m for m in final_state["messages"] if isinstance(m, AIMessage)]
+        message_id = None
+        response = ""
+        async for chunk, metadata in app.astream(initial_state, config=config, stream_mode="messages"):
+            if metadata.get("langgraph_node") != "agent" or not isinstance(chunk.content, str) or not chunk.content:
+                continue
+            # Only show the latest AI message, i.e. the answer after any tool calls
+            if chunk.id != message_id:
+                message_id = chunk.id
+                response = ""
+            response += chunk.content
+            yield response
         
-        # Return the content of the last AI message or a fallback message
-        if response_messages:
-            return response_messages[-1].content
-        return "No response generated."
+        # Fall back to a fixed message if the agent produced no text
+        if not response:
+            yield "No response generated."
     except Exception as e:
-        return f"An error occurred while processing your request: {str(e)}"
+        yield f"An error occurred while processing your request: {str(e)}"
@@ -2,46 +2,109 @@ import os
 import sys
 import uuid
 import asyncio
-from typing import Dict, List, Any, Optional, Tuple
+import threading
+from collections import OrderedDict
+from functools import cache
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Any, Optional, Tuple, Union
 
-from dotenv import load_dotenv
-from colorama import Fore, init
-
-from tavily import TavilyClient
-from langchain.tools import Tool
+import httpx
+from cachetools import TTLCache
+from colorama import Fore
 
 from typing import Literal
 
-from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langgraph.prebuilt import create_react_agent, ToolNode
 from langchain_core.tools import tool
 from langgraph.graph import MessagesState, END
-from langgraph.types import Command
+from langgraph.types import Command, Send
+from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import StateGraph, START
-from langchain_openai import ChatOpenAI
+from common.logs import get_logger, load_env
+from common.streaming import UpdateRelay
+
+# Tavily and langchain_openai are imported on first use, keeping them off the cold import path
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+    from tavily import TavilyClient
+
+
+# Progress messages go through one logger; set LOG_LEVEL to WARNING to silence them
+log = get_logger("realestate")
+load_env()
+
+
+# Pooled HTTP/2 connections, so the parallel agent branches multiplex over a few TLS sessions
+_HTTP_LIMITS = httpx.Limits(max_connections=128, max_keepalive_connections=64)
+
+
+# Pooled connections belong to the event loop that opened them. Every graph runs on this one
+# long-lived loop, so the cached async client never reuses a connection from a closed loop.
+_loop = asyncio.new_event_loop()
+threading.Thread(target=_loop.run_forever, name="langgraph-real-estate-loop", daemon=True).start()
 
+# Upper bound on sessions whose checkpoints are kept in memory
+_MAX_SESSIONS = 1_000
 
-load_dotenv()
-llm = ChatOpenAI()
+_ERROR_REPLY = (
+    "I apologize, but I'm experiencing technical difficulties. "
+    "Please try again later."
+)
+
+
+@cache
+def _get_llm() -> "ChatOpenAI":
+    """The chat model shared by every agent, created on first use"""
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        http_client=httpx.Client(limits=_HTTP_LIMITS, http2=True, timeout=30.0),
+        http_async_client=httpx.AsyncClient(limits=_HTTP_LIMITS, http2=True, timeout=30.0),
+    )
+
+
+# Shared preamble of every agent's system prompt
+BASE_SYSTEM_PROMPT = (
+    "You are a helpful AI assistant, collaborating with other assistants."
+    " Use the provided tools to progress towards answering the question."
+    " If you are unable to fully answer, that's OK, another assistant with different tools "
+    " will help where you left off. Execute what you can to make progress."
+    " If you or any of the other assistants have the final answer or deliverable,"
+    " prefix your response with FINAL ANSWER so the team knows to stop."
+)
+
+# Tavily results keyed by normalized query, shared by all routers in the process
+_SEARCH_CACHE = TTLCache(maxsize=1024, ttl=3600)
+_SEARCH_CACHE_LOCK = threading.Lock()
+
+
+def _cached_tavily(client: "TavilyClient", query: str) -> Dict[str, Any]:
+    """Search Tavily, reusing the result of an identical query from the last hour"""
+    key = query.strip().lower()
+    with _SEARCH_CACHE_LOCK:
+        result = _SEARCH_CACHE.get(key)
+    if result is None:
+        result = client.search(query)
+        with _SEARCH_CACHE_LOCK:
+            _SEARCH_CACHE[key] = result
+    return result
 
 class RealEstateRouter:
-    @staticmethod
-    def make_system_prompt(suffix: str) -> str:
-        return (
-            "You are a helpful AI assistant, collaborating with other assistants."
-            " Use the provided tools to progress towards answering the question."
-            " If you are unable to fully answer, that's OK, another assistant with different tools "
-            " will help where you left off. Execute what you can to make progress."
-            "Keep your final answer concise and to the point."
-            " If you or any of the other assistants have the final answer or deliverable,"
-            " prefix your response with FINAL ANSWER so the team knows to stop."
-            f"\n{suffix}"
-        )
+    # Opening system message of every new conversation; the fixed id stops add_messages from
+    # stamping a fresh one onto this shared instance
+    _SYSTEM_MSG = SystemMessage(
+        content=(
+            "You are a comprehensive real estate assistant. Use your knowledge to answer general questions."
+        ),
+        id="real-estate-system-prompt",
+    )
 
     def __init__(self):
-        init()
-
+        # Session ID per caller thread, reused across its turns; only the agent loop touches it
+        self._sessions: "OrderedDict[str, str]" = OrderedDict()
+        
         try:
+            from tavily import TavilyClient
+            
             # Get Tavily API key from environment
             tavily_api_key = os.getenv("TAVILY_API_KEY")
             if not tavily_api_key:
@@ -54,7 +117,7 @@ class RealEstateRouter:
             @tool
             def web_search(query: str) -> Dict[str, Any]:
                 """Search the web for real estate information."""
-                return self.tavily_client.search(query)
+                return _cached_tavily(self.tavily_client, query)
             
             # The line `self.web_search_tool = web_search` is initializing the `web_search_tool`
             # attribute of the `RealEstateRouter` class with the `web_search` function. This function
@@ -63,16 +126,17 @@ class RealEstateRouter:
             # `RealEstateRouter` for processing queries related to real estate.
             self.web_search_tool = web_search
             self.has_web_search = True
-            print(Fore.GREEN, "\n\n[Real Estate SDK] Tavily WebSearchTool initialized successfully\n")
+            log.info("[Real Estate SDK] Tavily WebSearchTool initialized successfully", extra={"color": Fore.GREEN})
         except Exception as e:
             self.has_web_search = False
             self.web_search_tool = None
-            print(Fore.RED, f"\n\n[Real Estate SDK] Error initializing Tavily WebSearchTool: {str(e)}\n")
-            print(Fore.YELLOW, "\n\n[Real Estate SDK] Continuing without web search capability\n")
+            log.error("[Real Estate SDK] Error initializing Tavily WebSearchTool: %s", e, extra={"color": Fore.RED})
+            log.warning("[Real Estate SDK] Continuing without web search capability", extra={"color": Fore.YELLOW})
         
-        # Create tool node with a list of tools
-        tools = [self.web_search_tool]
+        # One tool list shared by both search agents; empty when web search is unavailable
+        tools = [self.web_search_tool] if self.has_web_search else []
         self.web_search_tool_node = ToolNode(tools)
+        llm = _get_llm()
         
         self.property_search_agent = create_react_agent(
             llm,
@@ -103,24 +167,23 @@ class RealEstateRouter:
         workflow = StateGraph(MessagesState)
         workflow.add_node("real_estate_agent", self.real_estate_agent_node)
         workflow.add_node("property_search_agent", self.property_search_agent_node)
+        workflow.add_node("neighborhood_agent", self.neighborhood_agent_node)
 
         workflow.add_edge(START, "real_estate_agent")
-        self.graph = workflow.compile()
+        # Checkpoint each session's state in memory so later turns only carry the new message
+        self.checkpointer = MemorySaver()
+        self.graph = workflow.compile(checkpointer=self.checkpointer)
+        # Calls without a session run on a copy without a checkpointer, so they store nothing
+        self._stateless_graph = workflow.compile()
         
-        print(Fore.GREEN, "\n\n[Real Estate SDK] All agents initialized successfully\n")
+        log.info("[Real Estate SDK] All agents initialized successfully", extra={"color": Fore.GREEN})
         
 
     # General system prompt for the agents
-    def make_system_prompt(self, suffix: str) -> str:
-        return (
-            "You are a helpful AI assistant, collaborating with other assistants."
-            " Use the provided tools to progress towards answering the question."
-            " If you are unable to fully answer, that's OK, another assistant with different tools "
-            " will help where you left off. Execute what you can to make progress."
-            " If you or any of the other assistants have the final answer or deliverable,"
-            " prefix your response with FINAL ANSWER so the team knows to stop."
-            f"\n{suffix}"
-        )
+    @staticmethod
+    @cache
+    def make_system_prompt(suffix: str) -> str:
+        return f"{BASE_SYSTEM_PROMPT}\n{suffix}"
 
 
     # Any agent could decide the work is done
@@ -134,114 +197,176 @@ class RealEstateRouter:
 
 
 
-    def real_estate_agent_node(self, 
-        state: MessagesState,
-    ) -> Command[Literal["property_search_agent", END]]:
-        print(Fore.CYAN + "\n[Real Estate Coordinator] Processing query..." + Fore.RESET)
-        result = self.real_estate_agent.invoke(state)
-        goto = RealEstateRouter.get_next_node(result["messages"][-1], "property_search_agent")
+    async def _invoke_agent_node(
+        self, agent, name: str, label: str, state: MessagesState, goto: Union[str, List[str]],
+        handoff: Optional[str] = None,
+    ) -> Command:
+        """Shared body of the agent nodes: run the agent, pick the next node and hand off"""
+        result = await agent.ainvoke(state)
+        last_message = result["messages"][-1]
+        goto = RealEstateRouter.get_next_node(last_message, goto)
         
-        if goto == END:
-            print(Fore.GREEN + "[Real Estate Coordinator] Completed with final answer" + Fore.RESET)
+        if goto != END:
+            log.info("[%s] %s", label, handoff, extra={"color": Fore.YELLOW})
+        elif "FINAL ANSWER" in last_message.content:
+            log.info("[%s] Completed with final answer", label, extra={"color": Fore.GREEN})
         else:
-            print(Fore.YELLOW + "[Real Estate Coordinator] Delegating to Property Search Agent" + Fore.RESET)
+            # Terminal nodes end the run whether or not they reached a final answer
+            log.info("[%s] Answered", label, extra={"color": Fore.GREEN})
         
-        result["messages"][-1] = HumanMessage(
-            content=result["messages"][-1].content, name="real_estate_agent"
+        # The react agent returns the input history too; only hand the new messages to the reducer
+        new_messages = result["messages"][len(state["messages"]):]
+        new_messages[-1] = HumanMessage(
+            content=new_messages[-1].content, name=name
         )
+        
+        # Fan out to several specialists at once; each gets the history including this hand-off
+        if isinstance(goto, list):
+            fanout_state = {"messages": state["messages"] + new_messages}
+            goto = [Send(node, fanout_state) for node in goto]
         return Command(
-            update={"messages": result["messages"]},
+            update={"messages": new_messages},
             goto=goto,
         )
 
-
-
-
-
-    def property_search_agent_node(self, state: MessagesState) -> Command[Literal["real_estate_agent", END]]:
-        print(Fore.BLUE + "\n[Property Search Agent] Searching for information..." + Fore.RESET)
-        result = self.property_search_agent.invoke(state)
-        goto = RealEstateRouter.get_next_node(result["messages"][-1], "real_estate_agent")
-        
-        if goto == END:
-            print(Fore.GREEN + "[Property Search Agent] Completed with final answer" + Fore.RESET)
-        else:
-            print(Fore.YELLOW + "[Property Search Agent] Returning to Coordinator" + Fore.RESET)
-        
-        result["messages"][-1] = HumanMessage(
-            content=result["messages"][-1].content, name="property_search_agent"
+    async def real_estate_agent_node(self, 
+        state: MessagesState,
+    ) -> Command[Literal["property_search_agent", "neighborhood_agent", END]]:
+        log.info("[Real Estate Coordinator] Processing query...", extra={"color": Fore.CYAN})
+        # Both specialists run as parallel branches, and the run ends once both have answered
+        return await self._invoke_agent_node(
+            self.real_estate_agent, "real_estate_agent", "Real Estate Coordinator",
+            state, ["property_search_agent", "neighborhood_agent"],
+            "Delegating to Property Search and Neighborhood Agents",
         )
-        return Command(
-            update={"messages": result["messages"]},
-            goto=goto,
+
+    # The specialists run in the same superstep and both finish the run; looping each branch
+    # back to the coordinator would restart it once per branch
+    async def property_search_agent_node(self, state: MessagesState) -> Command[Literal[END]]:
+        log.info("[Property Search Agent] Searching for information...", extra={"color": Fore.BLUE})
+        return await self._invoke_agent_node(
+            self.property_search_agent, "property_search_agent", "Property Search Agent", state, END,
         )
     
-    def neighborhood_agent_node(self, state: MessagesState) -> Command[Literal["real_estate_agent", END]]:
-        print(Fore.BLUE + "\n[Property Search Agent] Searching for information..." + Fore.RESET)
-        result = self.neighborhood_agent.invoke(state)
-        goto = RealEstateRouter.get_next_node(result["messages"][-1], "real_estate_agent")
-        
-        if goto == END:
-            print(Fore.GREEN + "[Neighborhood Agent] Completed with final answer" + Fore.RESET)
-        else:
-            print(Fore.YELLOW + "[Neighborhood Agent] Returning to Coordinator" + Fore.RESET)
-        
-        result["messages"][-1] = HumanMessage(
-            content=result["messages"][-1].content, name="neighborhood_agent"
-        )
-        return Command(
-            update={"messages": result["messages"]},
-            goto=goto,
+    async def neighborhood_agent_node(self, state: MessagesState) -> Command[Literal[END]]:
+        log.info("[Neighborhood Agent] Searching for information...", extra={"color": Fore.BLUE})
+        return await self._invoke_agent_node(
+            self.neighborhood_agent, "neighborhood_agent", "Neighborhood Agent", state, END,
         )
 
 
-    def _run_agent(self, query: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Tuple[str, List[Dict[str, str]]]:
-        print(Fore.MAGENTA + f"\n[Real Estate System] Starting new query: '{query}'" + Fore.RESET)
+    async def _run_agent(
+        self, query: str, conversation_history: Optional[List[Union[BaseMessage, Dict[str, str]]]] = None, session_id: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, List[BaseMessage]]]:
+        log.info("[Real Estate System] Starting new query: '%s'", query, extra={"color": Fore.MAGENTA})
         if conversation_history is None:
-            conversation_history = [{
-                "role": "system",
-                "content": (
-                    "You are a comprehensive real estate assistant. Use your knowledge to answer general questions."
-                )
-            }]
-        conversation_history.append({
-            "role": "user",
-            "content": query
-        })
-        
+            # Earlier turns are restored from the checkpointer, so only this turn is sent.
+            # Re-sending the system message replaces it in place thanks to its fixed id.
+            conversation_history = [self._SYSTEM_MSG]
+        else:
+            # Convert legacy role/content dicts once so the graph only carries message objects
+            conversation_history = [
+                (HumanMessage(content=m["content"]) if m["role"] == "user" else SystemMessage(content=m["content"]))
+                if isinstance(m, dict) else m
+                for m in conversation_history
+            ]
         conversation_history.append(HumanMessage(content=query))
         
 
-        # Generate a unique session ID
-        session_id = str(uuid.uuid4())
-
+        if session_id is None:
+            graph, config = self._stateless_graph, {}
+        else:
+            graph, config = self.graph, {"configurable": {"thread_id": session_id}}
 
         try:
-            # Stream the response
-            response = ""
-            for output in self.graph.stream(
+            # Stream the reply of every node as it finishes, so the UI can render each step.
+            # Parallel branches each send their own update, so no specialist's answer is lost.
+            chunks: List[str] = []
+            async for update in graph.astream(
                 {"messages": conversation_history},
-                {"configurable": {"session_id": session_id}},
-                stream_mode="values"
+                config,
+                stream_mode="updates"
             ):
-                response += output["messages"][-1].content
-
-            return response, conversation_history
+                for node_update in update.values():
+                    if node_update and node_update.get("messages"):
+                        chunks.append(node_update["messages"][-1].content)
+                yield "\n\n".join(chunks), conversation_history
 
         
         except Exception as e:
+            log.error("[Real Estate System] Graph run failed: %s", e, extra={"color": Fore.RED})
             error_msg = (
                 "I apologize, but I'm currently experiencing some technical difficulties. "
                 "Could you please rephrase your question or ask something about real estate concepts?"
             )
-            return error_msg, conversation_history
+            yield error_msg, conversation_history
+
+    def _session_id(self, thread_id: Optional[str]) -> Optional[str]:
+        """Session ID of a caller's thread, minted on its first query"""
+        if thread_id is None:
+            return None
+        session_id = self._sessions.get(thread_id)
+        if session_id is None:
+            session_id = self._sessions[thread_id] = str(uuid.uuid4())
+            if len(self._sessions) > _MAX_SESSIONS:
+                # Forget the least recently used session and its checkpoints
+                _, evicted = self._sessions.popitem(last=False)
+                self.checkpointer.delete_thread(evicted)
+        else:
+            self._sessions.move_to_end(thread_id)
+        return session_id
+
+    async def _stream_on_loop(self, query: str, thread_id: Optional[str]) -> AsyncIterator[str]:
+        # Runs on the router's own loop, the only loop that touches the pooled async client
+        try:
+            async for response, _ in self._run_agent(query, session_id=self._session_id(thread_id)):
+                yield response
+        except Exception as e:
+            log.error("[Real Estate System] Error while streaming the response: %s", e, extra={"color": Fore.RED})
+            yield _ERROR_REPLY
+
+    async def _collect_on_loop(self, query: str, thread_id: Optional[str]) -> str:
+        # The full response is the last one streamed
+        response = ""
+        async for response in self._stream_on_loop(query, thread_id):
+            pass
+        return response
+
+    async def astream_query(self, query: str, thread_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield the growing response to a query as the graph produces it"""
+        relay = UpdateRelay()
+
+        async def produce() -> None:
+            async for response in self._stream_on_loop(query, thread_id):
+                relay.put(response)
+
+        future = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(produce(), _loop))
+        async for response in relay.drain(future):
+            yield response
+        if future.exception() is not None:
+            log.error("[Real Estate System] Critical error: %s", future.exception(), extra={"color": Fore.RED})
+            yield _ERROR_REPLY
+
+    async def aprocess_query(self, query: str, thread_id: Optional[str] = None) -> str:
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(self._collect_on_loop(query, thread_id), _loop)
+        )
 
     def process_query(self, query: str, thread_id: Optional[str] = None) -> str:
+        # Synchronous entry point; blocks on the router's long-lived event loop
         try:
-            response, _ = self._run_agent(query)
-            return response
+            return asyncio.run_coroutine_threadsafe(self._collect_on_loop(query, thread_id), _loop).result()
         except Exception as e:
-            return (
-                "I apologize, but I'm experiencing technical difficulties. "
-                "Please try again later."
-            )
+            log.error("[Real Estate System] Critical error: %s", e, extra={"color": Fore.RED})
+            return _ERROR_REPLY
+
+
+    async def _batch_on_loop(self, queries: List[str]) -> List[str]:
+        return list(await asyncio.gather(*(self._collect_on_loop(query, None) for query in queries)))
+
+    async def process_query_batch_async(self, queries: List[str]) -> List[str]:
+        """Run several independent queries concurrently on the shared graph"""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._batch_on_loop(queries), _loop))
+
+    def process_query_batch(self, queries: List[str]) -> List[str]:
+        return asyncio.run_coroutine_threadsafe(self._batch_on_loop(queries), _loop).result()
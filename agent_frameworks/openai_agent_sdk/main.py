@@ -1,37 +1,69 @@
 import os
 import sys
 import argparse
+import asyncio
+import threading
+from functools import lru_cache
 from colorama import Fore, init
 
 sys.path.insert(1, os.path.join(sys.path[0], ".."))
 
-import gradio as gr
-from router import AgentRouter
-from router_web import RealEstateRouter
+# Seconds to wait for a Celery worker's answer when USE_CELERY is set
+_CELERY_TIMEOUT = float(os.getenv("CELERY_TASK_TIMEOUT", "300"))
 
-def gradio_interface(message, history, router_type="default"):
-    # Initialize the appropriate router based on user selection
+# Gradio may run handlers on several worker threads; only one of them builds each router,
+# since a second AgentRouter would create duplicate Assistants on the server
+_router_lock = threading.Lock()
+
+@lru_cache(maxsize=2)
+def _get_router(router_type: str):
+    # Build each router once per process; AgentRouter creates its Assistants on init.
+    # Each router is imported only when selected, so one mode never loads the other's SDK.
     if router_type == "real_estate":
-        router = RealEstateRouter()
-    else:  # default to original data/SQL router
-        router = AgentRouter()
+        from router_web import RealEstateRouter
+        return RealEstateRouter()
+    from router import AgentRouter
+    return AgentRouter()  # default to original data/SQL router
+
+def _router(router_type: str):
+    with _router_lock:
+        return _get_router(router_type)
+
+async def gradio_interface(message, history, request, router_type="default"):
+    if router_type == "real_estate" and os.getenv("USE_CELERY"):
+        # Hand the query to a Celery worker so the request never waits on the agents' runtime.
+        # Without a running worker or a reachable broker the user gets an error instead of a hang.
+        try:
+            from tasks import run_realestate
+            task = await asyncio.to_thread(run_realestate.delay, message)
+            yield await asyncio.to_thread(task.get, timeout=_CELERY_TIMEOUT)
+        except Exception as e:
+            print(Fore.RED, f"\n\n[OpenAI Agent SDK] Celery task failed: {e}\n")
+            yield f"An error occurred while processing your request: {e}"
+        return
     
-    agent_response = router.process_query(message)
-    return agent_response
+    # Reuse the router for the user's selection across chat turns; the first call builds it off the event loop
+    router = await asyncio.to_thread(_router, router_type)
+    
+    if router_type == "real_estate":
+        # Stream the answer as the agents produce it
+        async for partial_response in router.process_query_stream(message):
+            yield partial_response
+        return
+    
+    # Gradio's session hash keeps every turn of a browser session on one Assistants thread
+    agent_response = await asyncio.to_thread(router.process_query, message, thread_id=request.session_hash)
+    yield agent_response
 
-def launch_app():
-    # Parse command line arguments
-    parser = argparse.ArgumentParser(description="OpenAI Agent SDK")
-    parser.add_argument("--mode", type=str, choices=["default", "real_estate"], 
-                      default="default", help="Agent mode: default (SQL/data) or real_estate")
-    args = parser.parse_args()
+def launch_app(mode="default"):
+    import gradio as gr
     
     # Initialize colorama for cross-platform colored terminal output
     init()
-    print(Fore.CYAN, f"\n\n[OpenAI Agent SDK] Initializing Gradio interface in {args.mode} mode\n")
+    print(Fore.CYAN, f"\n\n[OpenAI Agent SDK] Initializing Gradio interface in {mode} mode\n")
     
     # Title and description based on mode
-    if args.mode == "real_estate":
+    if mode == "real_estate":
         title = "OpenAI Agent SDK - Real Estate Assistant"
         description = "A real estate assistant that helps with property searches, mortgages, and neighborhood information."
         examples = [
@@ -41,24 +73,41 @@ def launch_app():
         ]
     else:
         title = "OpenAI Agent SDK"
-        description = "An agent using OpenAI Assistants API with specialized assistants for SQL queries and data analysis."
+        description = "An agent using OpenAI Assistants API with function tools for SQL queries and data analysis."
         examples = [
             "Show me total sales by region from the database",
             "Analyze customer trends from last quarter",
             "What were our top 5 products last year?"
         ]
     
-    # Create Gradio interface with partial function to pass router_type
+    # A closure binds router_type; unlike functools.partial it lets Gradio detect the gr.Request parameter
+    async def chat_fn(message, history, request: gr.Request):
+        async for partial_response in gradio_interface(message, history, request, router_type=mode):
+            yield partial_response
+    
+    # Create Gradio interface
     iface = gr.ChatInterface(
-        fn=lambda message, history: gradio_interface(message, history, args.mode), 
+        fn=chat_fn,
         title=title,
         description=description,
         examples=examples,
-        theme="soft"
+        theme="soft",
+        # Let several sessions wait on the agents at once instead of Gradio's default of one
+        concurrency_limit=32,
     )
     
-    print(Fore.GREEN, f"\n\n[OpenAI Agent SDK] Launching Gradio interface in {args.mode} mode\n")
-    iface.launch()
+    print(Fore.GREEN, f"\n\n[OpenAI Agent SDK] Launching Gradio interface in {mode} mode\n")
+    try:
+        iface.launch()
+    finally:
+        # Let the real estate router finish the queries it already dispatched
+        if mode == "real_estate" and _get_router.cache_info().currsize:
+            _router(mode).close()
 
 if __name__ == "__main__":
-    launch_app() 
\ No newline at end of file
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="OpenAI Agent SDK")
+    parser.add_argument("--mode", type=str, choices=["default", "real_estate"], 
+                      default="default", help="Agent mode: default (SQL/data) or real_estate")
+    args = parser.parse_args()
+    launch_app(args.mode)
@@ -1,12 +1,16 @@
 import os
 import sys
-from typing import Dict, List, Any
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional
 from colorama import Fore, init
 
 sys.path.insert(1, os.path.join(sys.path[0], ".."))
 
 from dotenv import load_dotenv
 from openai import OpenAI
+from openai.lib.streaming import AssistantStreamManager
 from openai.types.beta.assistant import Assistant
 from openai.types.beta.thread import Thread
 from openai.types.beta.threads.run import Run
@@ -15,10 +19,13 @@ from skills.skill_map import SkillMap
 
 load_dotenv()
 
+# Upper bound on cached session threads; the least recently used one is forgotten first
+_MAX_CACHED_THREADS = 10_000
+
 class AgentRouter:
     def __init__(self):
         """
-        Initialize the OpenAI Agent SDK router with assistants for SQL queries and data analysis.
+        Initialize the OpenAI Agent SDK router with an assistant for SQL queries and data analysis.
         """
         # Initialize colorama for cross-platform colored terminal output
         init()
@@ -26,42 +33,31 @@ class AgentRouter:
         self.client = OpenAI()
         self.skill_map = SkillMap()
         
-        # Create the SQL assistant for database operations
-        self.sql_assistant = self._create_sql_assistant()
+        # Worker threads for running independent tool calls of a run concurrently
+        self._tool_pool = ThreadPoolExecutor(max_workers=8)
         
-        # Create the analyzer assistant for data insights
-        self.data_analyzer = self._create_data_analyzer()
+        # Worker threads for batch queries, reused across batches
+        self._query_pool = ThreadPoolExecutor(max_workers=8)
         
-        # Create the main assistant that routes queries
-        self.router_assistant = self._create_router_assistant()
+        # One OpenAI thread per user session, so the conversation continues server-side
+        self._thread_cache: "OrderedDict[str, Thread]" = OrderedDict()
+        self._thread_cache_lock = threading.Lock()
         
-    def _create_sql_assistant(self) -> Assistant:
-        """Create an assistant specialized in SQL queries"""
-        sql_tools = [{"type": "function", "function": self.skill_map.get_function_schema_by_name("generate_and_run_sql_query")}]
+        # One assistant owns both skills and picks between them with function calling,
+        # so each query costs a single run instead of a classify run plus a specialist run
+        self.unified_assistant = self._create_unified_assistant()
         
-        return self.client.beta.assistants.create(
-            name="SQL Expert",
-            instructions="You generate and execute SQL queries based on user requests to extract data from databases.",
-            tools=sql_tools,
-            model="gpt-4-turbo-preview"
-        )
-    
-    def _create_data_analyzer(self) -> Assistant:
-        """Create an assistant specialized in data analysis"""
-        analysis_tools = [{"type": "function", "function": self.skill_map.get_function_schema_by_name("data_analyzer")}]
+    def _create_unified_assistant(self) -> Assistant:
+        """Create the assistant that answers SQL and data analysis queries with its tools"""
+        tools = [
+            {"type": "function", "function": self.skill_map.get_function_schema_by_name("generate_and_run_sql_query")},
+            {"type": "function", "function": self.skill_map.get_function_schema_by_name("data_analyzer")},
+        ]
         
         return self.client.beta.assistants.create(
-            name="Data Analyzer",
-            instructions="You analyze data and provide insights based on SQL query results.",
-            tools=analysis_tools,
-            model="gpt-4-turbo-preview"
-        )
-    
-    def _create_router_assistant(self) -> Assistant:
-        """Create the main router assistant to handle initial query classification"""
-        return self.client.beta.assistants.create(
-            name="Router",
+            name="Data Assistant",
             instructions=SYSTEM_PROMPT,
+            tools=tools,
             model="gpt-4-turbo-preview"
         )
     
@@ -69,6 +65,35 @@ class AgentRouter:
         """Create a new conversation thread"""
         return self.client.beta.threads.create()
     
+    def _get_thread(self, thread_id: Optional[str]) -> Thread:
+        """Return the session's thread, creating it on the first turn"""
+        # Queries without a session get a throwaway thread, as before
+        if thread_id is None:
+            return self._create_thread()
+        
+        # Gradio's worker threads share the cache, so every access holds the lock
+        with self._thread_cache_lock:
+            thread = self._thread_cache.get(thread_id)
+            if thread is not None:
+                self._thread_cache.move_to_end(thread_id)
+                return thread
+        
+        # The API call happens outside the lock so other sessions are not held up
+        thread = self._create_thread()
+        with self._thread_cache_lock:
+            # A concurrent first turn of the same session may have won the race; keep its thread
+            thread = self._thread_cache.setdefault(thread_id, thread)
+            self._thread_cache.move_to_end(thread_id)
+            if len(self._thread_cache) > _MAX_CACHED_THREADS:
+                self._thread_cache.popitem(last=False)
+        return thread
+    
+    def _forget_thread(self, thread_id: Optional[str], thread: Thread) -> None:
+        """Drop a session's cached thread, unless it was already replaced"""
+        with self._thread_cache_lock:
+            if thread_id is not None and self._thread_cache.get(thread_id) is thread:
+                del self._thread_cache[thread_id]
+    
     def _run_assistant(self, assistant_id: str, thread_id: str, user_message: str) -> str:
         """
         Run an assistant with a user message and return the response
@@ -82,109 +107,98 @@ class AgentRouter:
             content=user_message
         )
         
-        # Run the assistant
-        run = self.client.beta.threads.runs.create(
+        # Run the assistant and follow its events until it finishes
+        run = self._stream_run(self.client.beta.threads.runs.stream(
             thread_id=thread_id,
             assistant_id=assistant_id
-        )
-        
-        # Wait for completion
-        run = self._wait_for_run(thread_id, run.id)
+        ))
+        if run is None:
+            return "No response generated."
         
-        # Get and return the latest assistant response
-        messages = self.client.beta.threads.messages.list(thread_id=thread_id)
-        for message in messages.data:
-            if message.role == "assistant":
-                # Return the first assistant message (most recent)
-                content = message.content[0].text.value if message.content else "No response generated."
-                print(Fore.GREEN, f"\n\n[OpenAI Assistant] Response: {content[:100]}...\n")
-                return content
+        # Fetch only the newest message written by this run
+        messages = self.client.beta.threads.messages.list(
+            thread_id=thread_id, order="desc", limit=1, run_id=run.id
+        )
+        message = messages.data[0] if messages.data else None
+        if message is None or not message.content:
+            return "No response generated."
         
-        return "No response generated."
+        content = message.content[0].text.value
+        print(Fore.GREEN, f"\n\n[OpenAI Assistant] Response: {content[:100]}...\n")
+        return content
     
-    def _wait_for_run(self, thread_id: str, run_id: str) -> Run:
-        """Wait for a run to complete and handle any needed function calls"""
-        while True:
-            run = self.client.beta.threads.runs.retrieve(
-                thread_id=thread_id,
-                run_id=run_id
-            )
-            
-            if run.status == "completed":
-                return run
-            
-            if run.status == "requires_action":
-                self._handle_required_actions(thread_id, run_id, run.required_action)
-            
-            # For other statuses, wait before checking again
-            import time
-            time.sleep(1)
+    def _stream_run(self, stream_manager: Optional[AssistantStreamManager]) -> Optional[Run]:
+        """Consume a run's server-sent events, answering function calls the moment they are requested"""
+        run = None
+        while stream_manager is not None:
+            with stream_manager as stream:
+                stream_manager = None
+                for event in stream:
+                    # The stream ends here; tool outputs are submitted on a new stream
+                    if event.event == "thread.run.requires_action":
+                        stream_manager = self._handle_required_actions(
+                            event.data.thread_id, event.data.id, event.data.required_action
+                        )
+                run = stream.current_run
+        return run
     
-    def _handle_required_actions(self, thread_id: str, run_id: str, required_action: Any) -> None:
+    def _handle_required_actions(self, thread_id: str, run_id: str, required_action: Any) -> Optional[AssistantStreamManager]:
         """Handle function calls required by the assistant"""
         if not required_action or not required_action.submit_tool_outputs:
-            return
-        
-        tool_outputs = []
+            return None
         
+        # Execute all requested functions from the skill map in parallel
+        futures = {}
         for tool_call in required_action.submit_tool_outputs.tool_calls:
-            function_name = tool_call.function.name
-            function_args = tool_call.function.arguments
-            
-            print(Fore.BLUE, f"\n\n[OpenAI Assistant] Executing function: {function_name}\n")
-            
-            # Execute function from skill map
-            result = self.skill_map.execute_function(
-                function_name=function_name,
-                function_args=function_args
+            print(Fore.BLUE, f"\n\n[OpenAI Assistant] Executing function: {tool_call.function.name}\n")
+            future = self._tool_pool.submit(
+                self.skill_map.execute_function,
+                function_name=tool_call.function.name,
+                function_args=tool_call.function.arguments
             )
-            
-            tool_outputs.append({
-                "tool_call_id": tool_call.id,
-                "output": result
-            })
-        
-        # Submit the results back to the assistant
-        self.client.beta.threads.runs.submit_tool_outputs(
+            futures[future] = tool_call
+        
+        tool_outputs = []
+        for future in as_completed(futures):
+            tool_call = futures[future]
+            try:
+                output = future.result()
+            except Exception as e:
+                # Report the failure to the assistant; leaving the run unanswered would block the thread
+                print(Fore.RED, f"\n\n[OpenAI Assistant] Function {tool_call.function.name} failed: {e}\n")
+                output = f"Error executing {tool_call.function.name}: {e}"
+            tool_outputs.append({"tool_call_id": tool_call.id, "output": output})
+        
+        # Submit the results back to the assistant and keep streaming the run
+        return self.client.beta.threads.runs.submit_tool_outputs_stream(
             thread_id=thread_id,
             run_id=run_id,
             tool_outputs=tool_outputs
         )
     
-    def process_query(self, query: str) -> str:
+    def process_query(self, query: str, thread_id: Optional[str] = None) -> str:
         """
         Process a user query using the appropriate assistant
         """
         print(Fore.CYAN, f"\n\n[OpenAI Agent SDK] Received query: {query}\n")
         
-        # Create a new conversation thread
-        thread = self._create_thread()
-        
-        # First, use the router to determine the type of query
-        router_response = self._run_assistant(
-            assistant_id=self.router_assistant.id,
-            thread_id=thread.id,
-            user_message=f"Classify this query and decide which assistant should handle it: {query}"
-        )
+        # Continue the session's conversation thread, or start a new one
+        thread = self._get_thread(thread_id)
         
-        # Check router response to determine which assistant to use
-        if "SQL" in router_response or "database" in router_response.lower():
-            # SQL query - use SQL assistant
-            print(Fore.YELLOW, f"\n\n[OpenAI Agent SDK] Routing to SQL assistant\n")
+        # The assistant chooses the SQL or analysis tool itself within the run
+        try:
             return self._run_assistant(
-                assistant_id=self.sql_assistant.id,
+                assistant_id=self.unified_assistant.id,
                 thread_id=thread.id,
                 user_message=query
             )
-        elif "analysis" in router_response.lower() or "analyze" in router_response.lower():
-            # Data analysis - use data analyzer
-            print(Fore.YELLOW, f"\n\n[OpenAI Agent SDK] Routing to Data Analyzer assistant\n")
-            return self._run_assistant(
-                assistant_id=self.data_analyzer.id,
-                thread_id=thread.id,
-                user_message=query
-            )
-        else:
-            # Default to the router's response if classification is unclear
-            print(Fore.YELLOW, f"\n\n[OpenAI Agent SDK] Using default router response\n")
-            return router_response 
\ No newline at end of file
+        except Exception:
+            # A failed run may still be active on the thread, so the session's next turn starts a new one
+            self._forget_thread(thread_id, thread)
+            raise
+
+    def process_query_batch(self, queries: List[str]) -> List[str]:
+        """
+        Process several independent queries concurrently, preserving their order
+        """
+        return list(self._query_pool.map(self.process_query, queries))
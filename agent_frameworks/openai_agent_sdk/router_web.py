@@ -1,16 +1,260 @@
 import os
 import sys
 import asyncio
-import uuid
-from typing import Dict, List, Any
-from colorama import Fore, init
+import hashlib
+import itertools
+import threading
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, List, Any, Optional, Tuple, Union
+import httpx
+from cachetools import TTLCache
+from colorama import Fore
 
-sys.path.insert(1, os.path.join(sys.path[0], ".."))
+_FRAMEWORKS_DIR = os.path.join(sys.path[0], "..")
+if _FRAMEWORKS_DIR not in sys.path:
+    sys.path.insert(1, _FRAMEWORKS_DIR)
 
-from dotenv import load_dotenv
-from agents import Agent, Runner, WebSearchTool
+from common.batching import MicroBatcher
+from common.logs import get_logger, load_env
+from common.streaming import UpdateRelay
 
-load_dotenv()
+# Progress messages go through one logger whose level comes from LOG_LEVEL (default INFO)
+log = get_logger(__name__)
+
+# The agents SDK, openai and dotenv are imported when the router is built, keeping module import cheap
+if TYPE_CHECKING:
+    import numpy as np
+    from agents import Agent, RunResult, RunResultStreaming, TResponseInputItem
+
+# The web search tool is stateless, so every router and agent shares one instance
+_WEB_SEARCH = None
+_WEB_SEARCH_LOCK = threading.Lock()
+
+def _get_web_search():
+    global _WEB_SEARCH
+    with _WEB_SEARCH_LOCK:
+        if _WEB_SEARCH is None:
+            from agents import WebSearchTool
+            _WEB_SEARCH = WebSearchTool()
+    return _WEB_SEARCH
+
+# Keep-alive pooled connections for the OpenAI API, shared by every router in the process
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60)
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+@lru_cache(maxsize=1)
+def _get_openai_client():
+    """Sync client for embeddings; also installs the pooled async client the agents SDK runs on"""
+    from agents import set_default_openai_client
+    from openai import AsyncOpenAI, OpenAI
+    set_default_openai_client(
+        AsyncOpenAI(http_client=httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT))
+    )
+    return OpenAI(http_client=httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT))
+
+# One long-lived event loop runs every query, so the SDK's HTTP connection pool stays warm between turns
+_loop = asyncio.new_event_loop()
+threading.Thread(target=_loop.run_forever, name="real-estate-loop", daemon=True).start()
+
+# Session IDs only label log lines, so a process-local counter is enough
+_SESSION_COUNTER = itertools.count()
+
+# Part of every response cache key; bump it when the agents' instructions or handoffs change
+AGENT_VERSION = "1"
+
+# Answers that went through a web-searching specialist carry live listings and rates, so they expire sooner
+_RESPONSE_TTL = 3600
+_LIVE_RESPONSE_TTL = 300
+
+# Paraphrased queries reuse an answer above this cosine similarity; live answers need a closer match
+_EMBEDDING_MODEL = "text-embedding-3-small"
+_SIMILARITY_THRESHOLD = 0.92
+_LIVE_SIMILARITY_THRESHOLD = 0.95
+
+# Agent instructions, built once at import and shared by every router instance.
+# The _WEB variants are used when the WebSearchTool is available.
+# They open every request byte-for-byte identically so OpenAI's automatic prompt-prefix
+# caching can reuse them; bump AGENT_VERSION whenever one of them is edited.
+PROPERTY_SEARCH_INSTRUCTIONS_NOWEB = """
+    You are a real estate property search specialist.
+
+    When asked about properties or homes for sale, use your knowledge to provide information.
+
+    Return the information in a clear, structured format.
+
+    Always include if available:
+    - Property address
+    - Listing price
+    - Number of bedrooms and bathrooms
+    - Square footage
+    - Property type
+
+    After providing property listings, ask ONE specific follow-up question to learn more about the user's
+    preferences, budget constraints, or must-have features. This will help you provide more targeted property recommendations.
+"""
+
+PROPERTY_SEARCH_INSTRUCTIONS_WEB = """
+    You are a real estate property search specialist.
+
+    When asked about properties or homes for sale, use the web_search tool to find current listings.
+    Return the information in a clear, structured format.
+
+    Always include if available:
+    - Property address
+    - Listing price
+    - Number of bedrooms and bathrooms
+    - Square footage
+    - Property type
+    - URL to the actual listing (must be real URLs from your web search, never use example.com or placeholder URLs)
+
+    After providing property listings, ask ONE specific follow-up question to learn more about the user's
+    preferences, budget constraints, or must-have features. This will help you provide more targeted property recommendations.
+
+    If web search fails, politely explain that you're currently unable to access real-time listing data,
+    but can still discuss general property information for the area based on your knowledge.
+"""
+
+MORTGAGE_INSTRUCTIONS_NOWEB = """
+    You are a mortgage specialist.
+
+    Provide information about mortgage options, financing strategies, and loan considerations
+    based on your knowledge of the real estate market.
+
+    Consider the user's budget, down payment capabilities, and financial goals.
+
+    Always include when possible:
+    - Loan amount options
+    - General interest rate ranges
+    - Estimated monthly payments
+    - Recommended down payment
+
+    After providing mortgage information, ask ONE specific follow-up question to learn more about the user's
+    financial situation, credit score range, or long-term housing plans. This will help you provide more accurate mortgage advice.
+"""
+
+MORTGAGE_INSTRUCTIONS_WEB = """
+    You are a mortgage specialist.
+
+    When asked about mortgages, financing, or home loans, use the web_search tool to find current rates and information.
+    Consider the user's budget, down payment capabilities, and financial goals.
+
+    Always include when possible:
+    - Loan amount options
+    - Current interest rates
+    - Estimated monthly payments
+    - Recommended down payment
+
+    After providing mortgage information, ask ONE specific follow-up question to learn more about the user's
+    financial situation, credit score range, or long-term housing plans. This will help you provide more accurate mortgage advice.
+
+    If web search fails, politely explain that you're currently unable to access real-time mortgage rate data,
+    but can still discuss general mortgage concepts and strategies based on your knowledge.
+"""
+
+NEIGHBORHOOD_INSTRUCTIONS_NOWEB = """
+    You are a neighborhood information specialist.
+
+    Provide details about neighborhoods and locations based on your knowledge.
+    Focus on details about schools, amenities, safety, and transportation options.
+
+    Always include when possible:
+    - School information
+    - Local amenities (parks, shopping, restaurants)
+    - General safety information
+    - Public transportation options and walkability
+
+    After providing neighborhood information, ask ONE specific follow-up question to understand if the user
+    has specific concerns about the area or particular amenities they're looking for. This will help you provide more relevant information.
+"""
+
+NEIGHBORHOOD_INSTRUCTIONS_WEB = """
+    You are a neighborhood information specialist.
+
+    When asked about neighborhoods or locations, use the web_search tool to find relevant information.
+    Provide details about schools, amenities, safety, and transportation options.
+
+    Always include when possible:
+    - School ratings and districts
+    - Local amenities (parks, shopping, restaurants)
+    - Crime statistics and safety information
+    - Public transportation options and walkability
+
+    After providing neighborhood information, ask ONE specific follow-up question to understand if the user
+    has specific concerns about the area or particular amenities they're looking for. This will help you provide more relevant information.
+
+    If web search fails, politely explain that you're currently unable to access real-time neighborhood data,
+    but can still discuss general information about the area based on your knowledge.
+"""
+
+REAL_ESTATE_INSTRUCTIONS = """
+    You are a comprehensive real estate assistant that helps users find properties,
+    understand mortgage options, and learn about neighborhoods.
+
+    IMPORTANT: When specific current information is needed:
+    1. For specific property listings or homes for sale → hand off to property_search_agent
+    2. For current mortgage rates and specific financing calculations → hand off to mortgage_agent
+    3. For specific neighborhood data or current local information → hand off to neighborhood_agent
+
+    Make sure you keep the information about past querries.
+"""
+
+# (name, log label, instructions without web search, instructions with web search) per specialist
+AGENT_SPECS = [
+    ("property_search_agent", "Property Search", PROPERTY_SEARCH_INSTRUCTIONS_NOWEB, PROPERTY_SEARCH_INSTRUCTIONS_WEB),
+    ("mortgage_agent", "Mortgage", MORTGAGE_INSTRUCTIONS_NOWEB, MORTGAGE_INSTRUCTIONS_WEB),
+    ("neighborhood_agent", "Neighborhood", NEIGHBORHOOD_INSTRUCTIONS_NOWEB, NEIGHBORHOOD_INSTRUCTIONS_WEB),
+]
+
+# Seed of every new conversation, shared by reference since the SDK only reads it
+_SYSTEM_PROMPT = """You are a comprehensive real estate assistant. Use your knowledge to answer general questions.
+Only use web search when specific current information (like property listings, rates, or neighborhood data) is needed."""
+_DEFAULT_HISTORY: Tuple["TResponseInputItem", ...] = ({"role": "system", "content": _SYSTEM_PROMPT},)
+
+
+class _SemanticCache:
+    """Rolling buffer of (query embedding, response) pairs searched by cosine similarity"""
+    
+    def __init__(self, capacity: int = 2048):
+        self._capacity = capacity
+        # numpy is only needed by the caches, so it is imported when the first router is built
+        import numpy as np
+        self._vectors: Optional["np.ndarray"] = None
+        self._thresholds = np.zeros(capacity, dtype=np.float32)
+        self._expires = np.zeros(capacity)
+        self._responses: List[Optional[str]] = [None] * capacity
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def search(self, embedding: "np.ndarray") -> Optional[str]:
+        import numpy as np
+        with self._lock:
+            vectors = self._vectors
+            if vectors is None:
+                return None
+            # Vectors are unit length, so the dot product is the cosine similarity;
+            # rank by how far each entry clears its own threshold
+            margins = vectors[:self._size] @ embedding - self._thresholds[:self._size]
+            margins[self._expires[:self._size] < time.monotonic()] = -np.inf
+            best = int(np.argmax(margins))
+            if margins[best] < 0:
+                return None
+            return self._responses[best]
+    
+    def add(self, embedding: "np.ndarray", response: str, live: bool = False) -> None:
+        import numpy as np
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self._capacity, embedding.shape[0]), dtype=np.float32)
+            # Overwrite the oldest entry once the buffer is full
+            i = self._next
+            self._vectors[i] = embedding
+            self._thresholds[i] = _LIVE_SIMILARITY_THRESHOLD if live else _SIMILARITY_THRESHOLD
+            self._expires[i] = time.monotonic() + (_LIVE_RESPONSE_TTL if live else _RESPONSE_TTL)
+            self._responses[i] = response
+            self._next = (i + 1) % self._capacity
+            self._size = min(self._size + 1, self._capacity)
 
 class RealEstateRouter:
     def __init__(self):
@@ -18,273 +262,243 @@ class RealEstateRouter:
         Initialize the Real Estate Router with specialized agents for property search,
         mortgages, and neighborhood information.
         """
-        # Initialize colorama for cross-platform colored terminal output
-        init()
+        load_env()
         
         # Initialize web search tool with error handling
         try:
-            self.web_search = WebSearchTool()
+            self.web_search = _get_web_search()
             self.has_web_search = True
-            print(Fore.GREEN, "\n\n[Real Estate SDK] WebSearchTool initialized successfully\n")
+            log.info("[Real Estate SDK] WebSearchTool initialized successfully", extra={"color": Fore.GREEN})
         except Exception as e:
             self.has_web_search = False
-            print(Fore.RED, f"\n\n[Real Estate SDK] Error initializing WebSearchTool: {str(e)}\n")
-            print(Fore.YELLOW, "\n\n[Real Estate SDK] Continuing without web search capability\n")
+            log.error("[Real Estate SDK] Error initializing WebSearchTool: %s", e, extra={"color": Fore.RED})
+            log.warning("[Real Estate SDK] Continuing without web search capability", extra={"color": Fore.YELLOW})
         
-        # Create specialized agents
-        self.property_search_agent = self._create_property_search_agent()
-        self.mortgage_agent = self._create_mortgage_agent()
-        self.neighborhood_agent = self._create_neighborhood_agent()
+        # Create specialized agents, keyed by agent name
+        self.agents = self._create_specialist_agents()
         
         # Create the main orchestrator agent
         self.real_estate_agent = self._create_real_estate_agent()
         
-        print(Fore.GREEN, "\n\n[Real Estate SDK] All agents initialized successfully\n")
+        # Final answers keyed by normalized query; shared by Gradio's worker threads and the agent loop
+        self._response_cache = TTLCache(maxsize=1024, ttl=_RESPONSE_TTL)
+        self._live_response_cache = TTLCache(maxsize=1024, ttl=_LIVE_RESPONSE_TTL)
+        self._cache_lock = threading.Lock()
         
-    def _create_property_search_agent(self) -> Agent:
-        """Create an agent specialized in property search"""
-        print(Fore.GREEN, "\n\n[Real Estate SDK] Creating Property Search agent\n")
+        # Second cache tier that also matches paraphrases of earlier queries
+        self._openai = _get_openai_client()
+        self._semantic_cache = _SemanticCache()
         
-        instructions = """
-            You are a real estate property search specialist.
-
-            When asked about properties or homes for sale, use your knowledge to provide information.
-            
-            Return the information in a clear, structured format.
-
-            Always include if available:
-            - Property address
-            - Listing price
-            - Number of bedrooms and bathrooms
-            - Square footage
-            - Property type
-
-            After providing property listings, ask ONE specific follow-up question to learn more about the user's
-            preferences, budget constraints, or must-have features. This will help you provide more targeted property recommendations.
-        """
+        # Concurrent Gradio queries are dispatched to the agent loop at once, at most 8 runs in flight for the rate limits
+        self._dispatcher = MicroBatcher(self._run_agent, max_in_flight=8)
         
-        # Add web search only if available
-        tools = []
-        if self.has_web_search:
-            instructions = """
-                You are a real estate property search specialist.
-
-                When asked about properties or homes for sale, use the web_search tool to find current listings.
-                Return the information in a clear, structured format.
-
-                Always include if available:
-                - Property address
-                - Listing price
-                - Number of bedrooms and bathrooms
-                - Square footage
-                - Property type
-                - URL to the actual listing (must be real URLs from your web search, never use example.com or placeholder URLs)
-
-                After providing property listings, ask ONE specific follow-up question to learn more about the user's
-                preferences, budget constraints, or must-have features. This will help you provide more targeted property recommendations.
-                
-                If web search fails, politely explain that you're currently unable to access real-time listing data,
-                but can still discuss general property information for the area based on your knowledge.
-            """
-            tools = [self.web_search]
-            
-        return Agent(
-            name="property_search_agent",
-            instructions=instructions,
-            tools=tools,
-        )
-    
-    def _create_mortgage_agent(self) -> Agent:
-        """Create an agent specialized in mortgages"""
-        print(Fore.GREEN, "\n\n[Real Estate SDK] Creating Mortgage agent\n")
+        log.info("[Real Estate SDK] All agents initialized successfully", extra={"color": Fore.GREEN})
         
-        instructions = """
-            You are a mortgage specialist.
-
-            Provide information about mortgage options, financing strategies, and loan considerations
-            based on your knowledge of the real estate market.
-            
-            Consider the user's budget, down payment capabilities, and financial goals.
-
-            Always include when possible:
-            - Loan amount options
-            - General interest rate ranges
-            - Estimated monthly payments
-            - Recommended down payment
-
-            After providing mortgage information, ask ONE specific follow-up question to learn more about the user's
-            financial situation, credit score range, or long-term housing plans. This will help you provide more accurate mortgage advice.
-        """
+    def _create_specialist_agents(self) -> Dict[str, "Agent"]:
+        """Create the property search, mortgage and neighborhood agents from AGENT_SPECS"""
+        from agents import Agent
         
-        # Add web search only if available
-        tools = []
-        if self.has_web_search:
-            instructions = """
-                You are a mortgage specialist.
-
-                When asked about mortgages, financing, or home loans, use the web_search tool to find current rates and information.
-                Consider the user's budget, down payment capabilities, and financial goals.
-
-                Always include when possible:
-                - Loan amount options
-                - Current interest rates
-                - Estimated monthly payments
-                - Recommended down payment
-
-                After providing mortgage information, ask ONE specific follow-up question to learn more about the user's
-                financial situation, credit score range, or long-term housing plans. This will help you provide more accurate mortgage advice.
-                
-                If web search fails, politely explain that you're currently unable to access real-time mortgage rate data,
-                but can still discuss general mortgage concepts and strategies based on your knowledge.
-            """
-            tools = [self.web_search]
-            
-        return Agent(
-            name="mortgage_agent",
-            instructions=instructions,
-            tools=tools,
-        )
+        agents = {}
+        for name, label, instructions_noweb, instructions_web in AGENT_SPECS:
+            log.info("[Real Estate SDK] Creating %s agent", label, extra={"color": Fore.GREEN})
+            # Add web search only if available
+            agents[name] = Agent(
+                name=name,
+                instructions=instructions_web if self.has_web_search else instructions_noweb,
+                tools=[self.web_search] if self.has_web_search else [],
+            )
+        return agents
     
-    def _create_neighborhood_agent(self) -> Agent:
-        """Create an agent specialized in neighborhood information"""
-        print(Fore.GREEN, "\n\n[Real Estate SDK] Creating Neighborhood agent\n")
-        
-        instructions = """
-            You are a neighborhood information specialist.
-
-            Provide details about neighborhoods and locations based on your knowledge.
-            Focus on details about schools, amenities, safety, and transportation options.
-
-            Always include when possible:
-            - School information
-            - Local amenities (parks, shopping, restaurants)
-            - General safety information
-            - Public transportation options and walkability
-
-            After providing neighborhood information, ask ONE specific follow-up question to understand if the user
-            has specific concerns about the area or particular amenities they're looking for. This will help you provide more relevant information.
-        """
-        
-        # Add web search only if available
-        tools = []
-        if self.has_web_search:
-            instructions = """
-                You are a neighborhood information specialist.
-
-                When asked about neighborhoods or locations, use the web_search tool to find relevant information.
-                Provide details about schools, amenities, safety, and transportation options.
-
-                Always include when possible:
-                - School ratings and districts
-                - Local amenities (parks, shopping, restaurants)
-                - Crime statistics and safety information
-                - Public transportation options and walkability
-
-                After providing neighborhood information, ask ONE specific follow-up question to understand if the user
-                has specific concerns about the area or particular amenities they're looking for. This will help you provide more relevant information.
-                
-                If web search fails, politely explain that you're currently unable to access real-time neighborhood data,
-                but can still discuss general information about the area based on your knowledge.
-            """
-            tools = [self.web_search]
-            
-        return Agent(
-            name="neighborhood_agent",
-            instructions=instructions,
-            tools=tools,
-        )
-    
-    def _create_real_estate_agent(self) -> Agent:
+    def _create_real_estate_agent(self) -> "Agent":
         """Create the main real estate orchestrator agent"""
-        print(Fore.GREEN, "\n\n[Real Estate SDK] Creating main Real Estate agent\n")
+        from agents import Agent
+        log.info("[Real Estate SDK] Creating main Real Estate agent", extra={"color": Fore.GREEN})
         
-        # Base instructions for no web search
-        instructions = """
-            You are a comprehensive real estate assistant that helps users find properties,
-            understand mortgage options, and learn about neighborhoods.
-
-            IMPORTANT: When specific current information is needed:
-            1. For specific property listings or homes for sale → hand off to property_search_agent
-            2. For current mortgage rates and specific financing calculations → hand off to mortgage_agent
-            3. For specific neighborhood data or current local information → hand off to neighborhood_agent
-            
-            Make sure you keep the information about past querries.
-
-        """
-            
         return Agent(
             name="real_estate_agent",
-            instructions=instructions,
-            handoffs=[self.property_search_agent, self.mortgage_agent, self.neighborhood_agent],
+            instructions=REAL_ESTATE_INSTRUCTIONS,
+            handoffs=list(self.agents.values()),
         )
     
-    async def _run_agent(self, query: str, conversation_history=None) -> str:
-        """Run the appropriate agent with the user query"""
-        print(Fore.MAGENTA, f"\n\n[Real Estate SDK] Processing query: {query}\n")
+    def close(self) -> None:
+        """Stop the dispatcher, waiting for the queries it already started"""
+        asyncio.run_coroutine_threadsafe(self._dispatcher.aclose(), _loop).result()
+    
+    @staticmethod
+    def _cache_key(query: str) -> str:
+        return hashlib.sha256(f"{query.strip().lower()}|{AGENT_VERSION}".encode()).hexdigest()
+    
+    def lookup(self, query: str) -> Optional[str]:
+        """Return the cached response to a query, or None"""
+        key = self._cache_key(query)
+        with self._cache_lock:
+            response = self._response_cache.get(key)
+            if response is None:
+                response = self._live_response_cache.get(key)
+        return response
+    
+    def update(self, query: str, response: str, live: bool = False, embedding: Optional["np.ndarray"] = None) -> None:
+        """Cache the response to a query; live answers use the shorter TTL"""
+        cache = self._live_response_cache if live else self._response_cache
+        with self._cache_lock:
+            cache[self._cache_key(query)] = response
+        if embedding is not None:
+            self._semantic_cache.add(embedding, response, live=live)
+    
+    def _embed(self, query: str) -> Optional["np.ndarray"]:
+        """Unit-length embedding of a query, or None if the embeddings call fails"""
+        try:
+            data = self._openai.embeddings.create(model=_EMBEDDING_MODEL, input=query).data
+        except Exception as e:
+            log.error("[Real Estate SDK] Embedding failed, skipping semantic cache: %s", e, extra={"color": Fore.RED})
+            return None
+        import numpy as np
+        embedding = np.asarray(data[0].embedding, dtype=np.float32)
+        return embedding / np.linalg.norm(embedding)
+    
+    async def _run_agent(
+        self,
+        query: str,
+        conversation_history: Optional[List["TResponseInputItem"]] = None,
+        embedding: Optional["np.ndarray"] = None,
+        on_text: Optional[Callable[[str], None]] = None,
+    ) -> Tuple[str, List["TResponseInputItem"]]:
+        """Run the appropriate agent with the user query, passing the growing answer to on_text if given"""
+        log.info("[Real Estate SDK] Processing query: %s", query, extra={"color": Fore.MAGENTA})
         
         # Initialize or update conversation history
         if conversation_history is None:
-            conversation_history = [{
-                "role": "system",
-                "content": """You are a comprehensive real estate assistant. Use your knowledge to answer general questions.
-                Only use web search when specific current information (like property listings, rates, or neighborhood data) is needed."""
-            }]
+            conversation_history = list(_DEFAULT_HISTORY)
         
-        # Add user query to conversation
-        new_input = conversation_history + [{"role": "user", "content": query}]
+        # Add user query to conversation in place rather than copying the whole history
+        conversation_history.append({"role": "user", "content": query})
+        new_input = conversation_history
         
         try:
             # Run the agent
-            print(Fore.BLUE, f"\n\n[Real Estate SDK] Running real estate agent\n")
+            log.info("[Real Estate SDK] Running real estate agent", extra={"color": Fore.BLUE})
             
             # Track if handoff is attempted
-            print(Fore.WHITE, f"\n[Real Estate SDK] Checking if handoff is needed...")
+            log.info("[Real Estate SDK] Checking if handoff is needed...", extra={"color": Fore.WHITE})
             
-            result = await Runner.run(self.real_estate_agent, new_input)
+            from agents import Runner
+            result: Union["RunResult", "RunResultStreaming"]
+            if on_text is None:
+                result = await Runner.run(self.real_estate_agent, new_input)
+            else:
+                result = Runner.run_streamed(self.real_estate_agent, new_input)
+                await self._forward_text(result, on_text)
             
             # Log which specialized agent was used (if any)
-            if hasattr(result, 'last_agent') and result.last_agent and result.last_agent.name != "real_estate_agent":
-                print(Fore.YELLOW, f"\n[Real Estate SDK] Handoff detected!")
-                print(Fore.YELLOW, f"[Real Estate SDK] ⮕ Query was handled by: {result.last_agent.name}")
+            last_agent = result.last_agent
+            handed_off = last_agent.name != "real_estate_agent"
+            if handed_off:
+                log.info("[Real Estate SDK] Handoff detected!", extra={"color": Fore.YELLOW})
+                log.info("[Real Estate SDK] ⮕ Query was handled by: %s", last_agent.name, extra={"color": Fore.YELLOW})
             else:
-                print(Fore.CYAN, "\n[Real Estate SDK] No handoff needed - Query handled by main real estate agent")
+                log.info("[Real Estate SDK] No handoff needed - Query handled by main real estate agent", extra={"color": Fore.CYAN})
             
             # Extract response
-            response = result.final_output
-            print(Fore.GREEN, f"\n\n[Real Estate SDK] Agent response: {response[:100]}...\n")
+            response: str = result.final_output
+            log.debug("[Real Estate SDK] Agent response: %.100s...", response, extra={"color": Fore.GREEN})
+            
+            # Only successful answers are cached; the specialists may have used live web results
+            self.update(query, response, live=bool(handed_off and self.has_web_search), embedding=embedding)
             
             return response, result.to_input_list()
             
         except Exception as e:
             error_msg = f"I apologize, but I'm currently experiencing some technical difficulties with my real-time data access. I can still help you with general real estate questions based on my knowledge. Could you please rephrase your question or ask something about real estate concepts, market trends, or general advice?"
-            print(Fore.RED, f"\n\n[Real Estate SDK] Error: {str(e)}\n")
+            log.error("[Real Estate SDK] Error: %s", e, extra={"color": Fore.RED})
             
             # Return a user-friendly error message and the original conversation history
             return error_msg, conversation_history
     
+    @staticmethod
+    async def _forward_text(result: Any, on_text: Callable[[str], None]) -> None:
+        """Pass the text of a streamed run to on_text as it grows"""
+        from openai.types.responses import ResponseTextDeltaEvent
+        
+        chunks: List[str] = []
+        async for event in result.stream_events():
+            # Only the answer of the agent that currently holds the conversation is shown
+            if event.type == "agent_updated_stream_event":
+                chunks = []
+            elif event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                chunks.append(event.data.delta)
+                on_text("".join(chunks))
+    
+    def _find_cached(self, query: str) -> Tuple[Optional[str], Optional["np.ndarray"]]:
+        """Return a cached answer to the query, and its embedding when the exact cache missed"""
+        # Repeated queries are answered from the cache without running the agents
+        cached = self.lookup(query)
+        if cached is not None:
+            log.info("[Real Estate SDK] Returning cached response", extra={"color": Fore.GREEN})
+            return cached, None
+        
+        # On an exact miss, one embedding call can still find the answer to a paraphrase
+        embedding = self._embed(query)
+        if embedding is not None:
+            cached = self._semantic_cache.search(embedding)
+            if cached is not None:
+                log.info("[Real Estate SDK] Returning cached response for a similar query", extra={"color": Fore.GREEN})
+        return cached, embedding
+    
     def process_query(self, query: str) -> str:
         """
         Process a user query using the real estate agent system
         This is the main entry point that matches the interface expected by the main.py file
         """
-        print(Fore.CYAN, f"\n\n[Real Estate SDK] Received query: {query}\n")
+        log.info("[Real Estate SDK] Received query: %s", query, extra={"color": Fore.CYAN})
         
-        # Create a unique session ID for this conversation
-        session_id = str(uuid.uuid4())
-        print(Fore.YELLOW, f"\n\n[Real Estate SDK] Session ID: {session_id}\n")
+        cached, embedding = self._find_cached(query)
+        if cached is not None:
+            return cached
         
-        # We need to run the async function in a synchronous context for Gradio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        # Create a unique session ID for this conversation
+        session_id = f"sess-{next(_SESSION_COUNTER)}"
+        log.info("[Real Estate SDK] Session ID: %s", session_id, extra={"color": Fore.YELLOW})
         
+        # Gradio calls this synchronously, so hand the coroutine to the shared background loop
         try:
             # Run the agent and get the response
-            response, _ = loop.run_until_complete(self._run_agent(query))
+            future = asyncio.run_coroutine_threadsafe(self._dispatcher.submit(query, embedding=embedding), _loop)
+            response, _ = future.result()
         except Exception as e:
             # Catch any uncaught exceptions and return a friendly error message
-            print(Fore.RED, f"\n\n[Real Estate SDK] Critical error: {str(e)}\n")
+            log.error("[Real Estate SDK] Critical error: %s", e, extra={"color": Fore.RED})
+            response = "I apologize, but I'm experiencing technical difficulties at the moment. Please try again later or ask me a general real estate question that doesn't require accessing external data."
+        
+        return response
+    
+    async def process_query_stream(self, query: str) -> AsyncIterator[str]:
+        """
+        Process a user query and yield the growing response as the agents produce it
+        The agents still run on the shared background loop; only the text crosses over
+        """
+        log.info("[Real Estate SDK] Received query: %s", query, extra={"color": Fore.CYAN})
+        
+        cached, embedding = await asyncio.to_thread(self._find_cached, query)
+        if cached is not None:
+            yield cached
+            return
+        
+        relay = UpdateRelay()
+        
+        # Streamed runs go through the dispatcher too, so UI traffic shares its in-flight bound
+        future = asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(
+                self._dispatcher.submit(query, embedding=embedding, on_text=relay.put), _loop
+            )
+        )
+        async for text in relay.drain(future):
+            yield text
+        
+        try:
+            response, _ = await future
+        except Exception as e:
+            log.error("[Real Estate SDK] Critical error: %s", e, extra={"color": Fore.RED})
             response = "I apologize, but I'm experiencing technical difficulties at the moment. Please try again later or ask me a general real estate question that doesn't require accessing external data."
-        finally:
-            loop.close()
         
-        return response
\ No newline at end of file
+        # The final answer replaces the streamed text, including the fallback message after an error
+        yield response
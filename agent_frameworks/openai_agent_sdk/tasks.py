@@ -0,0 +1,32 @@
+import os
+import sys
+from functools import lru_cache
+
+# Workers are started with `celery -A tasks worker` from this directory
+_HERE = os.path.dirname(os.path.abspath(__file__))
+for _path in (_HERE, os.path.dirname(_HERE)):
+    if _path not in sys.path:
+        sys.path.insert(1, _path)
+
+from celery import Celery
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Redis is both the broker and the result store, so finished answers survive UI restarts
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+app = Celery("agent_tasks", broker=REDIS_URL, backend=REDIS_URL)
+app.conf.result_expires = 3600
+
+@lru_cache(maxsize=1)
+def _get_router():
+    # Each worker process builds the router once and reuses it for every task
+    from router_web import RealEstateRouter
+    return RealEstateRouter()
+
+# Tasks are acknowledged after they finish, so a query on a crashed worker is redelivered
+@app.task(acks_late=True, reject_on_worker_lost=True)
+def run_realestate(query: str) -> str:
+    """Answer a real estate query on a worker"""
+    return _get_router().process_query(query)
@@ -1,5 +1,8 @@
 import os
 import sys
+import asyncio
+import threading
+from functools import lru_cache
 from colorama import Fore, init
 
 sys.path.insert(1, os.path.join(sys.path[0], ".."))
@@ -7,10 +10,24 @@ sys.path.insert(1, os.path.join(sys.path[0], ".."))
 import gradio as gr
 from router import SwarmRouter
 
-def gradio_interface(message, history):
-    router = SwarmRouter()
-    agent_response = router.process_query(message)
-    return agent_response
+# Gradio may run handlers on several worker threads; only one of them builds the router
+_router_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def _get_router() -> SwarmRouter:
+    # Build the Swarm client and its agents once per process
+    return SwarmRouter()
+
+def _router() -> SwarmRouter:
+    with _router_lock:
+        return _get_router()
+
+async def gradio_interface(message, history):
+    # The first call builds the router, so it is fetched off the event loop too
+    router = await asyncio.to_thread(_router)
+    # Gradio renders each yielded text as the latest state of the reply
+    async for partial_response in router.process_query_stream(message):
+        yield partial_response
 
 def launch_app():
     # Initialize colorama for cross-platform colored terminal output
@@ -20,7 +37,9 @@ def launch_app():
     iface = gr.ChatInterface(
         fn=gradio_interface, 
         title="OpenAI Swarms Agent",
-        description="A multi-agent system using OpenAI Swarms for SQL queries and data analysis."
+        description="A multi-agent system using OpenAI Swarms for SQL queries and data analysis.",
+        # Swarm runs on worker threads, so several sessions can be served at once
+        concurrency_limit=32,
     )
     
     print(Fore.GREEN, "\n\n[OpenAI Swarms Agent] Launching Gradio interface\n")
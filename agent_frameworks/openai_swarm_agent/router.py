@@ -1,32 +1,93 @@
 import os
 import sys
-from typing import Dict, List
-from colorama import Fore, init
+import asyncio
+import hashlib
+import threading
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional
+import httpx
+from cachetools import TTLCache
+from colorama import Fore
 
-sys.path.insert(1, os.path.join(sys.path[0], ".."))
+_FRAMEWORKS_DIR = os.path.join(sys.path[0], "..")
+if _FRAMEWORKS_DIR not in sys.path:
+    sys.path.insert(1, _FRAMEWORKS_DIR)
 
-from dotenv import load_dotenv
+from common.logs import get_logger, load_env
+from common.streaming import UpdateRelay
 from prompt_templates.router_template import SYSTEM_PROMPT
 from skills.skill_map import SkillMap
-from swarm import Agent, Swarm
 
-load_dotenv()
+# swarm and dotenv are imported when the router is built, keeping module import cheap
+if TYPE_CHECKING:
+    from swarm import Agent
+
+# Progress messages go through one logger whose level comes from LOG_LEVEL (default INFO)
+log = get_logger(__name__)
+
+# Part of every response cache key; bump it when the agents' instructions or functions change
+AGENT_VERSION = "1"
+_RESPONSE_TTL = 3600
+
+# Keep-alive pooled connections for the OpenAI API, reused by every Swarm run
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60)
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+# Redis is an optional second cache tier shared across workers and restarts
+try:
+    import redis
+except ImportError:
+    redis = None  # type: ignore[assignment]
+
+_redis_pool = None
+
+def _get_redis_pool():
+    # One connection pool per process, created on first use
+    global _redis_pool
+    if _redis_pool is None:
+        # Short timeouts so an unreachable Redis falls back to the in-process cache instead of stalling queries
+        _redis_pool = redis.ConnectionPool.from_url(
+            os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            decode_responses=True,
+            socket_connect_timeout=1,
+            socket_timeout=1,
+        )
+    return _redis_pool
 
 class SwarmRouter:
     def __init__(self):
-        # Initialize colorama for cross-platform colored terminal output
-        init()
+        load_env()
+        from openai import OpenAI
+        from swarm import Agent, Swarm
         
-        self.client = Swarm()
+        self.client = Swarm(
+            client=OpenAI(http_client=httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT))
+        )
         self.skill_map = SkillMap()
         
+        # Final answers keyed by normalized query, shared by concurrent callers
+        self._response_cache = TTLCache(maxsize=1024, ttl=_RESPONSE_TTL)
+        self._cache_lock = threading.Lock()
+        
+        # Connect the Redis tier with error handling; without it only the in-process cache is used
+        try:
+            if redis is None:
+                raise ImportError("redis package is not installed")
+            self.redis = redis.Redis(connection_pool=_get_redis_pool())
+            self.redis.ping()
+            self.has_redis = True
+            log.info("[Swarm Agent] Redis response cache connected", extra={"color": Fore.GREEN})
+        except Exception as e:
+            self.redis = None
+            self.has_redis = False
+            log.warning("[Swarm Agent] Continuing without Redis response cache: %s", e, extra={"color": Fore.YELLOW})
+        
         # Create the analyzer agent for data analysis
         self.analyzer_agent = Agent(
             name="Data Analyzer",
             instructions="You analyze data and provide insights based on SQL query results.",
             functions=[self.skill_map.get_function_callable_by_name("data_analyzer")]
         )
-        print(Fore.GREEN, "\n\n[Swarm Agent] Created Data Analyzer agent\n")
+        log.info("[Swarm Agent] Created Data Analyzer agent", extra={"color": Fore.GREEN})
         
         # Create the SQL agent for query generation
         self.sql_agent = Agent(
@@ -37,7 +98,7 @@ class SwarmRouter:
                 self.transfer_to_analyzer
             ]
         )
-        print(Fore.GREEN, "\n\n[Swarm Agent] Created SQL Expert agent\n")
+        log.info("[Swarm Agent] Created SQL Expert agent", extra={"color": Fore.GREEN})
         
         # Create the router agent that decides which agent to use
         self.router_agent = Agent(
@@ -48,26 +109,119 @@ class SwarmRouter:
                 self.transfer_to_analyzer
             ]
         )
-        print(Fore.GREEN, "\n\n[Swarm Agent] Created Router agent\n")
+        log.info("[Swarm Agent] Created Router agent", extra={"color": Fore.GREEN})
 
-    def transfer_to_sql(self):
-        print(Fore.YELLOW, "\n\n[Swarm Agent] Transferring to SQL Expert agent\n")
+    def transfer_to_sql(self) -> "Agent":
+        log.info("[Swarm Agent] Transferring to SQL Expert agent", extra={"color": Fore.YELLOW})
         return self.sql_agent
         
-    def transfer_to_analyzer(self):
-        print(Fore.YELLOW, "\n\n[Swarm Agent] Transferring to Data Analyzer agent\n")
+    def transfer_to_analyzer(self) -> "Agent":
+        log.info("[Swarm Agent] Transferring to Data Analyzer agent", extra={"color": Fore.YELLOW})
         return self.analyzer_agent
         
+    def _cache_key(self, query: str) -> str:
+        # The model is part of the key so switching it does not serve another model's answers
+        key = f"{query.strip().lower()}|{AGENT_VERSION}|{self.router_agent.model}"
+        return hashlib.sha256(key.encode()).hexdigest()
+    
+    def lookup(self, query: str) -> Optional[str]:
+        """Return the cached response to a query, checking memory first and then Redis"""
+        key = self._cache_key(query)
+        with self._cache_lock:
+            response = self._response_cache.get(key)
+        if response is not None or not self.has_redis:
+            return response
+        
+        try:
+            response = self.redis.get(f"resp:{key}")
+        except Exception as e:
+            log.error("[Swarm Agent] Redis lookup failed: %s", e, extra={"color": Fore.RED})
+            return None
+        if response is not None:
+            # Promote the Redis hit so the next lookup stays in process
+            with self._cache_lock:
+                self._response_cache[key] = response
+        return response
+    
+    def update(self, query: str, response: str) -> None:
+        """Cache the response to a query in memory and in Redis"""
+        key = self._cache_key(query)
+        with self._cache_lock:
+            self._response_cache[key] = response
+        if self.has_redis:
+            try:
+                self.redis.setex(f"resp:{key}", _RESPONSE_TTL, response)
+            except Exception as e:
+                log.error("[Swarm Agent] Redis update failed: %s", e, extra={"color": Fore.RED})
+        
     def process_query(self, query: str) -> str:
-        print(Fore.CYAN, f"\n\n[Swarm Agent] Received query: {query}\n")
+        log.info("[Swarm Agent] Received query: %s", query, extra={"color": Fore.CYAN})
+        
+        # Repeated queries are answered from the cache without running the agents
+        cached = self.lookup(query)
+        if cached is not None:
+            log.info("[Swarm Agent] Returning cached response", extra={"color": Fore.GREEN})
+            return cached
         
-        print(Fore.MAGENTA, "\n\n[Swarm Agent] Starting router agent to process query\n")
+        log.info("[Swarm Agent] Starting router agent to process query", extra={"color": Fore.MAGENTA})
         response = self.client.run(
             agent=self.router_agent,
             messages=[{"role": "user", "content": query}]
         )
         
-        result = response.messages[-1]["content"]
-        print(Fore.BLUE, f"\n\n[Swarm Agent] Final response: {result[:100]}...\n")
+        result: str = response.messages[-1]["content"]
+        log.debug("[Swarm Agent] Final response: %.100s...", result, extra={"color": Fore.BLUE})
+        
+        if result:
+            self.update(query, result)
+        return result
+    
+    async def process_query_async(self, query: str) -> str:
+        # Swarm only has a blocking client, so the run happens on a worker thread
+        # and the caller's event loop stays free during the LLM round-trips
+        return await asyncio.to_thread(self.process_query, query)
+    
+    async def process_query_stream(self, query: str) -> AsyncIterator[str]:
+        """Yield the growing response to a query as Swarm streams it"""
+        log.info("[Swarm Agent] Received query: %s", query, extra={"color": Fore.CYAN})
+        
+        # The lookup may go to Redis, so it stays off the event loop too
+        cached = await asyncio.to_thread(self.lookup, query)
+        if cached is not None:
+            log.info("[Swarm Agent] Returning cached response", extra={"color": Fore.GREEN})
+            yield cached
+            return
+        
+        relay = UpdateRelay()
+        
+        def produce() -> str:
+            # Swarm's stream is a blocking generator, so it is drained on a worker thread
+            log.info("[Swarm Agent] Starting router agent to process query", extra={"color": Fore.MAGENTA})
+            chunks: List[str] = []
+            response = None
+            for chunk in self.client.run(
+                agent=self.router_agent,
+                messages=[{"role": "user", "content": query}],
+                stream=True
+            ):
+                if "response" in chunk:
+                    response = chunk["response"]
+                elif chunk.get("delim") == "start":
+                    # Only the latest message is shown, i.e. the answer after any transfers
+                    chunks = []
+                elif chunk.get("content"):
+                    chunks.append(chunk["content"])
+                    relay.put("".join(chunks))
+            
+            if response is None:
+                raise RuntimeError("Swarm stream ended without a response")
+            result: str = response.messages[-1]["content"]
+            log.debug("[Swarm Agent] Final response: %.100s...", result, extra={"color": Fore.BLUE})
+            if result:
+                self.update(query, result)
+            return result
         
-        return result 
\ No newline at end of file
+        future = asyncio.ensure_future(asyncio.to_thread(produce))
+        async for text in relay.drain(future):
+            yield text
+        yield await future
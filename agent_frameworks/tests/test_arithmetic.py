@@ -0,0 +1,40 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# The router builds its model client at import time; no request is made in these tests
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from langgraph.router import _try_arithmetic
+
+
+class TryArithmeticTest(unittest.TestCase):
+    def test_x_is_multiplication(self):
+        self.assertEqual(_try_arithmetic("Calculate 245 x 37"), "245 x 37 = 9065")
+        self.assertEqual(_try_arithmetic("2 X 3"), "2 X 3 = 6")
+
+    def test_negative_operands(self):
+        self.assertEqual(_try_arithmetic("-3 * 4"), "-3 * 4 = -12")
+        self.assertEqual(_try_arithmetic("5 - -2"), "5 - -2 = 7")
+
+    def test_integer_results_drop_the_fraction(self):
+        self.assertEqual(_try_arithmetic("6 / 3"), "6 / 3 = 2")
+        self.assertEqual(_try_arithmetic("1.5 + 1.5"), "1.5 + 1.5 = 3")
+
+    def test_fractional_results_stay_floats(self):
+        self.assertEqual(_try_arithmetic("3 / 2"), "3 / 2 = 1.5")
+        self.assertEqual(_try_arithmetic("what is 0.1 + 0.2?"), "0.1 + 0.2 = 0.3")
+
+    def test_division_by_zero_is_left_to_the_model(self):
+        self.assertIsNone(_try_arithmetic("5 / 0"))
+        self.assertIsNone(_try_arithmetic("5 / 0.0"))
+
+    def test_other_text_is_left_to_the_model(self):
+        self.assertIsNone(_try_arithmetic("What is the weather in Paris?"))
+        self.assertIsNone(_try_arithmetic("Calculate 2 + 2 and explain why"))
+        self.assertIsNone(_try_arithmetic(""))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import sys
+import asyncio
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.batching import MicroBatcher
+
+
+class MicroBatcherTest(unittest.IsolatedAsyncioTestCase):
+    async def test_results_follow_their_calls(self):
+        async def double(x):
+            await asyncio.sleep(0)
+            return 2 * x
+
+        batcher = MicroBatcher(double)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        self.assertEqual(results, [0, 2, 4, 6, 8])
+        await batcher.aclose()
+
+    async def test_lone_call_is_dispatched_without_waiting(self):
+        loop = asyncio.get_running_loop()
+        started = []
+
+        async def record(x):
+            started.append(loop.time())
+            return x
+
+        batcher = MicroBatcher(record)
+        submitted = loop.time()
+        self.assertEqual(await batcher.submit(1), 1)
+        self.assertLess(started[0] - submitted, 0.005)
+        await batcher.aclose()
+
+    async def test_exceptions_reach_their_caller(self):
+        async def fail(x):
+            if x == 1:
+                raise ValueError("boom")
+            return x
+
+        batcher = MicroBatcher(fail)
+        results = await asyncio.gather(batcher.submit(0), batcher.submit(1), return_exceptions=True)
+        self.assertEqual(results[0], 0)
+        self.assertIsInstance(results[1], ValueError)
+        await batcher.aclose()
+
+    async def test_in_flight_calls_are_bounded(self):
+        running = 0
+        peak = 0
+
+        async def slow(x):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return x
+
+        batcher = MicroBatcher(slow, max_in_flight=2)
+        await asyncio.gather(*(batcher.submit(i) for i in range(6)))
+        self.assertEqual(peak, 2)
+        await batcher.aclose()
+
+    async def test_aclose_waits_for_dispatched_calls(self):
+        finished = asyncio.Event()
+
+        async def slow(x):
+            await asyncio.sleep(0.02)
+            finished.set()
+            return x
+
+        batcher = MicroBatcher(slow)
+        call = asyncio.ensure_future(batcher.submit(1))
+        await asyncio.sleep(0.01)
+        await batcher.aclose()
+        self.assertTrue(finished.is_set())
+        self.assertEqual(await call, 1)
+        self.assertIsNone(batcher._drain_task)
+
+
+if __name__ == "__main__":
+    unittest.main()
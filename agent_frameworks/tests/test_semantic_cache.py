@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from openai_agent_sdk.router_web import _SemanticCache
+
+
+def _unit(similarity: float) -> np.ndarray:
+    """Unit vector whose cosine similarity with (1, 0) is the given value"""
+    return np.array([similarity, np.sqrt(1 - similarity ** 2)], dtype=np.float32)
+
+
+class SemanticCacheTest(unittest.TestCase):
+    def test_empty_cache_misses(self):
+        self.assertIsNone(_SemanticCache().search(_unit(1.0)))
+
+    def test_similar_query_hits(self):
+        cache = _SemanticCache()
+        cache.add(_unit(1.0), "answer")
+        self.assertEqual(cache.search(_unit(0.93)), "answer")
+        self.assertIsNone(cache.search(_unit(0.9)))
+
+    def test_live_entries_need_a_closer_match(self):
+        cache = _SemanticCache()
+        cache.add(_unit(1.0), "live answer", live=True)
+        self.assertIsNone(cache.search(_unit(0.93)))
+        self.assertEqual(cache.search(_unit(0.96)), "live answer")
+
+    def test_best_margin_wins(self):
+        cache = _SemanticCache()
+        # The live entry is more similar but clears its threshold by less
+        cache.add(_unit(0.99), "live answer", live=True)
+        cache.add(_unit(0.97), "answer")
+        query = np.array([1.0, 0.0], dtype=np.float32)
+        self.assertEqual(cache.search(query), "answer")
+
+    def test_entries_expire(self):
+        cache = _SemanticCache()
+        now = time.monotonic()
+        with mock.patch("time.monotonic", return_value=now):
+            cache.add(_unit(1.0), "answer")
+            cache.add(_unit(0.999), "live answer", live=True)
+        with mock.patch("time.monotonic", return_value=now + 600):
+            self.assertEqual(cache.search(_unit(0.999)), "answer")
+        with mock.patch("time.monotonic", return_value=now + 7200):
+            self.assertIsNone(cache.search(_unit(1.0)))
+
+    def test_oldest_entry_is_overwritten_when_full(self):
+        cache = _SemanticCache(capacity=2)
+        cache.add(_unit(1.0), "first")
+        cache.add(_unit(0.0), "second")
+        cache.add(_unit(0.5), "third")
+        self.assertIsNone(cache.search(_unit(1.0)))
+        self.assertEqual(cache.search(_unit(0.0)), "second")
+        self.assertEqual(cache.search(_unit(0.5)), "third")
+
+
+if __name__ == "__main__":
+    unittest.main()